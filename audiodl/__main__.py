@@ -2,22 +2,28 @@
 AudioDL launcher module.
 
 Usage:
-  python -m audiodl
+  python -m audiodl                 start the GUI
+  python -m audiodl URL [...]       headless batch mode (see audiodl.cli)
 
-This starts the Tkinter GUI defined in `yt_playlist_gui.py` and ensures the
-default output directory exists.
+The GUI is defined in `yt_playlist_gui.py` and ensures the default output
+directory exists. Batch mode never imports tkinter, so it works on machines
+without a display.
 """
 
-from pathlib import Path
-
-try:
-    # Import the existing GUI app without moving user files.
-    from yt_playlist_gui import App, DEFAULT_OUT_DIR
-except Exception as exc:  # pragma: no cover
-    raise SystemExit(f"Failed to import GUI: {exc}")
+import sys
 
 
 def main() -> None:
+    if len(sys.argv) > 1:
+        from audiodl.cli import main as cli_main
+        raise SystemExit(cli_main(sys.argv[1:]))
+
+    try:
+        # Import the existing GUI app without moving user files.
+        from yt_playlist_gui import App, DEFAULT_OUT_DIR
+    except Exception as exc:  # pragma: no cover
+        raise SystemExit(f"Failed to import GUI: {exc}")
+
     DEFAULT_OUT_DIR.mkdir(exist_ok=True)
     app = App()
     app.mainloop()
@@ -25,4 +31,3 @@ def main() -> None:
 
 if __name__ == "__main__":
     main()
-
@@ -0,0 +1,119 @@
+"""
+Per-output-directory index of downloaded video IDs.
+
+The index is stored inside the output directory in yt-dlp's
+`--download-archive` format ("youtube <id>" per line), so it can be shared
+with plain yt-dlp runs. Membership checks are set lookups. The directory is
+only rescanned when its mtime is newer than the archive file, i.e. when
+something other than AudioDL added, renamed or removed files.
+"""
+
+import os
+import re
+import threading
+from pathlib import Path
+
+ARCHIVE_NAME = ".audiodl-archive.txt"
+AUDIO_EXTS   = {".m4a", ".mp3", ".flac", ".wav", ".opus", ".ogg", ".aac"}
+
+_ID_RE = re.compile(r"[-_ ]?\[?([A-Za-z0-9_-]{11})\]?$")
+
+
+def scan_directory(out_dir: Path) -> set[str]:
+    """Collect video IDs from audio file names like 'Title [id].ext'."""
+    found = set()
+    with os.scandir(out_dir) as it:
+        for f in it:
+            stem, ext = os.path.splitext(f.name)
+            if ext.lower() not in AUDIO_EXTS:
+                continue
+            m = _ID_RE.search(stem)
+            if m:
+                found.add(m.group(1))
+    return found
+
+
+class DownloadArchive:
+    _instances: dict[Path, "DownloadArchive"] = {}
+    _registry_lock = threading.Lock()
+
+    @classmethod
+    def for_directory(cls, out_dir: Path) -> "DownloadArchive":
+        key = Path(out_dir).resolve()
+        with cls._registry_lock:
+            if key not in cls._instances:
+                cls._instances[key] = cls(key)
+            return cls._instances[key]
+
+    def __init__(self, out_dir: Path):
+        self.out_dir = Path(out_dir)
+        self.path = self.out_dir / ARCHIVE_NAME
+        self._ids: set[str] = set()
+        self._loaded_mtime = None
+        self._lock = threading.Lock()
+
+    def __contains__(self, video_id: str) -> bool:
+        return video_id in self._ids
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    def reconcile(self, force: bool = False):
+        """Bring the in-memory set up to date, rescanning only if needed."""
+        with self._lock:
+            self._reconcile(force)
+
+    def add(self, video_id: str):
+        """Record a finished download; appends a single line to the archive."""
+        with self._lock:
+            if self._loaded_mtime is None:
+                # Never loaded: read the existing archive first, otherwise
+                # the mtime recorded below would hide it from reconcile().
+                self._reconcile()
+            if video_id in self._ids:
+                return
+            with open(self.path, "a", encoding="utf-8") as fh:
+                fh.write(f"youtube {video_id}\n")
+                fh.flush()
+                os.fsync(fh.fileno())
+            self._ids.add(video_id)
+            self._loaded_mtime = self.path.stat().st_mtime_ns
+
+    # ---------------- INTERNALS ----------------
+    def _reconcile(self, force: bool = False):
+        try:
+            dir_mtime = self.out_dir.stat().st_mtime_ns
+        except OSError:
+            self._ids = set()
+            self._loaded_mtime = None
+            return
+        try:
+            arc_mtime = self.path.stat().st_mtime_ns
+        except OSError:
+            arc_mtime = None
+
+        if force or arc_mtime is None or dir_mtime > arc_mtime:
+            self._rescan()
+        elif arc_mtime != self._loaded_mtime:
+            self._load(arc_mtime)
+
+    def _load(self, arc_mtime: int):
+        ids = set()
+        with open(self.path, encoding="utf-8") as fh:
+            for line in fh:
+                parts = line.split()
+                if len(parts) == 2:
+                    ids.add(parts[1])
+        self._ids = ids
+        self._loaded_mtime = arc_mtime
+
+    def _rescan(self):
+        ids = scan_directory(self.out_dir)
+        tmp = self.path.with_name(self.path.name + ".tmp")
+        tmp.write_text("".join(f"youtube {vid}\n" for vid in sorted(ids)), encoding="utf-8")
+        os.replace(tmp, self.path)
+        # The rename bumps the directory mtime; touch the archive afterwards
+        # so it does not look stale on the next reconcile.
+        os.utime(self.path)
+        self._ids = ids
+        self._loaded_mtime = self.path.stat().st_mtime_ns
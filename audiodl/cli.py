@@ -0,0 +1,245 @@
+"""
+Headless batch mode.
+
+  python -m audiodl URL [URL ...] [-i urls.txt] [-o DIR] [-f mp3] [-j 4]
+
+Every event is written to stdout as one JSON object per line, e.g.
+
+  {"event": "playlist", "url": "...", "count": 120, "ts": 1700000000.0}
+  {"event": "progress", "id": "...", "pct": 42.0, "speed": "1.2MiB/s", "eta": "00:10", ...}
+  {"event": "done", "id": "...", "ok": true, ...}
+  {"event": "summary", "done": 118, "failed": 2, ...}
+
+This module must not import tkinter.
+"""
+
+import argparse
+import json
+import queue
+import sys
+import threading
+import time
+from pathlib import Path
+
+from audiodl import core
+from audiodl.archive import DownloadArchive
+from audiodl.entries import Entry
+from audiodl.library import Library
+from audiodl.loudness import Normalizer, MODES as NORMALIZE_MODES, DEFAULT_TARGET_LUFS
+from audiodl.metrics import Metrics
+from audiodl.scheduler import DONE, FAILED, CANCELLED
+from audiodl.thumbnails import ThumbnailCache
+from audiodl.throttle import parse_rate
+
+EXIT_OK              = 0
+EXIT_DOWNLOAD_FAILED = 1
+EXIT_USAGE           = 2
+EXIT_FETCH_FAILED    = 3
+EXIT_INTERRUPTED     = 130
+
+FORMATS = list(core.AUDIO_FORMATS)
+PROGRESS_INTERVAL = 0.5  # seconds between progress events per video
+
+_print_lock = threading.Lock()
+
+
+def emit(event: str, **fields):
+    fields = {"event": event, **fields, "ts": round(time.time(), 3)}
+    line = json.dumps(fields, ensure_ascii=False)
+    with _print_lock:
+        sys.stdout.write(line + "\n")
+        sys.stdout.flush()
+
+
+def read_url_file(path: str) -> list[str]:
+    fh = sys.stdin if path == "-" else open(path, encoding="utf-8")
+    with fh:
+        return core.parse_url_list(fh.read())
+
+
+def build_parser() -> argparse.ArgumentParser:
+    p = argparse.ArgumentParser(
+        prog="python -m audiodl",
+        description="Download playlists as audio without the GUI. "
+                    "Run without arguments to start the GUI.",
+    )
+    p.add_argument("urls", nargs="*", metavar="URL", help="playlist URL or ID")
+    p.add_argument("-i", "--input", action="append", default=[], metavar="FILE",
+                   help="file with one URL per line ('-' for stdin)")
+    p.add_argument("-o", "--output", default=str(core.DEFAULT_OUT_DIR), help="output directory")
+    p.add_argument("-f", "--format", default="aac", choices=FORMATS, help="audio format")
+    p.add_argument("--fetch-workers", type=int, default=core.DEFAULT_FETCH_WORKERS, metavar="N",
+                   help="playlists enumerated at once")
+    p.add_argument("-j", "--concurrency", type=int, default=core.DEFAULT_CONCURRENCY,
+                   help="parallel downloads")
+    p.add_argument("--limit-rate", type=parse_rate, metavar="RATE",
+                   help="approximate total bandwidth cap shared by all downloads, e.g. 500K or 4.2M")
+    p.add_argument("--adaptive", action="store_true",
+                   help="adjust parallel downloads (up to -j) to throughput and throttling")
+    p.add_argument("--retries", type=int, default=core.DEFAULT_RETRIES, help="retries per video")
+    p.add_argument("--cpu-workers", type=int, metavar="N",
+                   help="parallel conversions (default: number of CPUs)")
+    p.add_argument("--pipeline", dest="pipeline", action="store_true", default=core.DEFAULT_PIPELINE,
+                   help="convert transcoded videos in a separate pool while the next ones download")
+    p.add_argument("--no-pipeline", dest="pipeline", action="store_false",
+                   help="download and convert in one yt-dlp process per video (default)")
+    p.add_argument("--batch-size", type=int, default=core.DEFAULT_BATCH_SIZE, metavar="N",
+                   help="videos per yt-dlp process (1 = one process per video)")
+    p.add_argument("--redownload", action="store_true",
+                   help="also download videos already present in the output directory")
+    p.add_argument("--no-library", dest="library", action="store_false",
+                   help="do not reuse or record files in the shared library index")
+    p.add_argument("--library-hash", action="store_true",
+                   help="record SHA-256 of library files so changed files can be verified")
+    p.add_argument("--no-thumbnail-cache", dest="thumbnail_cache", action="store_false",
+                   help="fetch every thumbnail again instead of reusing cached ones")
+    p.add_argument("--normalize", choices=NORMALIZE_MODES,
+                   help="measure loudness and write ReplayGain tags (tag; not for m4a) or apply the gain "
+                        "while transcoding (apply)")
+    p.add_argument("--target-lufs", type=float, default=DEFAULT_TARGET_LUFS, metavar="LUFS",
+                   help="loudness target for --normalize")
+    p.add_argument("--metrics-log", default=str(core.METRICS_LOG), metavar="FILE",
+                   help="append per-video stage timings as JSON lines ('' to disable)")
+    p.add_argument("--prometheus-file", metavar="FILE", help="write Prometheus text metrics here")
+    p.add_argument("--metrics-port", type=int, metavar="PORT",
+                   help="serve Prometheus metrics on http://127.0.0.1:PORT/metrics")
+    p.add_argument("--yt-dlp", dest="ytdlp", metavar="PATH", help="yt-dlp executable")
+    p.add_argument("--ffmpeg", metavar="PATH", help="ffmpeg executable")
+    return p
+
+
+def _pump(q: queue.Queue, stop: threading.Event):
+    """Translate scheduler/download messages into JSON lines."""
+    last_progress: dict[str, float] = {}
+    while not (stop.is_set() and q.empty()):
+        try:
+            msg, *payload = q.get(timeout=0.1)
+        except queue.Empty:
+            continue
+        if msg == "progress":
+            vid, pct, spd, eta = payload
+            now = time.monotonic()
+            if pct < 100 and now - last_progress.get(vid, 0) < PROGRESS_INTERVAL:
+                continue
+            last_progress[vid] = now
+            emit("progress", id=vid, pct=pct, speed=spd, eta=eta)
+        elif msg == "state":
+            emit("state", id=payload[0], state=payload[1])
+        elif msg == "network":
+            emit("network", **payload[0])
+        elif msg == "path":
+            emit("path", id=payload[0], path=payload[1])
+        elif msg == "done":
+            emit("done", id=payload[0], ok=payload[1])
+        elif msg == "warning":
+            emit("warning", message=payload[0])
+        elif msg == "timing":
+            emit("timing", **payload[1])
+        elif msg == "loudness":
+            emit("loudness", id=payload[0], **payload[1])
+
+
+def main(argv: list[str] | None = None) -> int:
+    args = build_parser().parse_args(argv)
+    if args.ytdlp:
+        core.YTDLP_EXE = Path(args.ytdlp)
+    if args.ffmpeg:
+        core.FFMPEG_EXE = Path(args.ffmpeg)
+
+    urls = list(args.urls)
+    try:
+        for path in args.input:
+            urls.extend(read_url_file(path))
+    except OSError as e:
+        emit("error", message=str(e))
+        return EXIT_USAGE
+    if not urls:
+        emit("error", message="No playlist URLs given.")
+        return EXIT_USAGE
+
+    out = Path(args.output)
+    out.mkdir(parents=True, exist_ok=True)
+    archive = DownloadArchive.for_directory(out)
+    archive.reconcile()
+
+    urls = list(dict.fromkeys(urls))
+    listings: dict[str, list[Entry]] = {}
+    fetch_failed = 0
+    try:
+        for url, entries, error in core.fetch_playlists(urls, args.fetch_workers):
+            if error is not None:
+                fetch_failed += 1
+                emit("error", url=url, message=str(error).strip())
+                continue
+            emit("playlist", url=url, count=len(entries))
+            listings[url] = entries
+    except KeyboardInterrupt:
+        emit("summary", interrupted=True)
+        return EXIT_INTERRUPTED
+
+    # Keep the order the URLs were given in, whatever finished first.
+    ids = list(dict.fromkeys(
+        e.id for url in urls for e in listings.get(url, ()) if e.id
+    ))
+    skipped = 0
+    if not args.redownload:
+        todo = [vid for vid in ids if vid not in archive]
+        skipped = len(ids) - len(todo)
+        ids = todo
+
+    metrics = Metrics(log_path=args.metrics_log or None, prometheus_path=args.prometheus_file)
+    if args.metrics_port:
+        try:
+            metrics.serve(args.metrics_port)
+        except OSError as e:
+            emit("warning", message=f"Metrics endpoint not started: {e}")
+
+    library = None
+    if args.library and not args.redownload:
+        library = Library(core.LIBRARY_FILE, hash_files=args.library_hash)
+    thumbnails = ThumbnailCache(core.THUMBNAIL_DIR) if args.thumbnail_cache else None
+    normalizer = None
+    if args.normalize:
+        normalizer = Normalizer(core.LOUDNESS_FILE, args.normalize, args.target_lufs, ffmpeg=core.FFMPEG_EXE)
+
+    q: queue.Queue = queue.Queue()
+    scheduler = core.build_scheduler(
+        out, q, args.format, workers=args.concurrency, retries=args.retries,
+        pipeline=args.pipeline, cpu_workers=args.cpu_workers, batch_size=args.batch_size,
+        metrics=metrics, rate_limit=args.limit_rate, adaptive=args.adaptive, library=library,
+        thumbnails=thumbnails, normalizer=normalizer,
+    )
+    stop = threading.Event()
+    pump = threading.Thread(target=_pump, args=(q, stop), daemon=True)
+    pump.start()
+    emit("start", total=len(ids), skipped=skipped, output=str(out),
+         format=args.format, concurrency=scheduler.workers, batch_size=scheduler.batch_size,
+         rate_limit=args.limit_rate, adaptive=args.adaptive,
+         cpu_workers=scheduler.cpu_workers if args.pipeline else None)
+
+    runner = threading.Thread(target=scheduler.run, args=(ids,), daemon=True)
+    runner.start()
+    interrupted = False
+    try:
+        while runner.is_alive():
+            runner.join(0.2)
+    except KeyboardInterrupt:
+        interrupted = True
+        scheduler.cancel()
+        runner.join()
+    stop.set()
+    pump.join()
+
+    counts = scheduler.counts()
+    emit("summary", total=len(ids), skipped=skipped, done=counts.get(DONE, 0),
+         failed=counts.get(FAILED, 0), cancelled=counts.get(CANCELLED, 0),
+         fetch_failed=fetch_failed, interrupted=interrupted, metrics=metrics.summary(),
+         network=scheduler.governor.snapshot() if scheduler.governor is not None else None)
+    metrics.close()
+    if interrupted:
+        return EXIT_INTERRUPTED
+    if counts.get(FAILED, 0):
+        return EXIT_DOWNLOAD_FAILED
+    if fetch_failed:
+        return EXIT_FETCH_FAILED
+    return EXIT_OK
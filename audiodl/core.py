@@ -0,0 +1,688 @@
+"""
+yt-dlp helpers shared by the GUI and the headless CLI.
+
+Nothing in here may import tkinter: `python -m audiodl <url>` runs on
+machines without a display.
+"""
+
+import json
+import queue
+import re
+import shutil
+import subprocess
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from pathlib import Path
+
+from audiodl.archive import DownloadArchive
+from audiodl.entries import Entry
+from audiodl.metrics import StageTimer
+from audiodl.scheduler import DownloadScheduler, DOWNLOADING, POSTPROCESSING, DONE
+from audiodl.throttle import NetworkGovernor
+
+
+def _find_tool(bundled: Path, name: str) -> Path:
+    """Prefer the executable shipped next to the app, else the one on PATH."""
+    if bundled.exists():
+        return bundled
+    found = shutil.which(name)
+    return Path(found) if found else bundled
+
+
+# ------------------------------------------------------------------
+# CONFIGURATION
+# ------------------------------------------------------------------
+BASE_DIR        = Path(__file__).resolve().parent.parent
+YTDLP_EXE       = _find_tool(BASE_DIR / "yt-dlp.exe", "yt-dlp")
+FFMPEG_EXE      = _find_tool(BASE_DIR / "ffmpeg" / "bin" / "ffmpeg.exe", "ffmpeg")
+DEFAULT_OUT_DIR = BASE_DIR / "Musiques"
+SETTINGS_FILE   = BASE_DIR / "settings.json"
+JOURNAL_FILE    = BASE_DIR / "jobs.json"
+METRICS_LOG     = BASE_DIR / "logs" / "downloads.jsonl"
+CACHE_DIR       = BASE_DIR / "cache"
+THUMBNAIL_DIR   = CACHE_DIR / "thumbnails"
+LOUDNESS_FILE   = CACHE_DIR / "loudness.jsonl"
+LIBRARY_FILE    = BASE_DIR / "library.jsonl"
+DEFAULT_CONCURRENCY = 3
+DEFAULT_RETRIES     = 2
+DEFAULT_PIPELINE    = False   # measured slower for remux-only runs, see build_scheduler
+DEFAULT_BATCH_SIZE  = 8
+DEFAULT_FETCH_WORKERS = 6
+
+# Requested format -> (yt-dlp --audio-format, stream preference, source
+# codecs that ExtractAudio copies into the target container as-is).
+# "aac" is written as .m4a so the copied stream can carry tags and cover art.
+AUDIO_FORMATS = {
+    "aac":  ("m4a",  "bestaudio[acodec^=mp4a]/bestaudio/best", ("mp4a", "aac")),
+    "mp3":  ("mp3",  "bestaudio[acodec=mp3]/bestaudio/best",   ("mp3",)),
+    "opus": ("opus", "bestaudio[acodec=opus]/bestaudio/best",  ("opus",)),
+    "flac": ("flac", "bestaudio[acodec=flac]/bestaudio/best",  ("flac",)),
+    "wav":  ("wav",  "bestaudio/best",                         ()),
+}
+REMUX     = "remux"
+TRANSCODE = "transcode"
+LIBRARY   = "library"    # reused from another folder, nothing downloaded
+
+# ------------------------------------------------------------------
+# UTILITIES
+# ------------------------------------------------------------------
+def run(cmd: list[str]) -> subprocess.CompletedProcess:
+    return subprocess.run(cmd, capture_output=True, text=True)
+
+
+def iter_playlist(url: str, cancel: threading.Event | None = None):
+    """
+    Yield flat playlist entries while yt-dlp is still enumerating.
+
+    Uses `--flat-playlist -j`, which prints one JSON object per entry, so the
+    first entries are available long before a large channel is fully listed.
+    Each object is reduced to an `Entry` as soon as it is parsed.
+
+    A non-zero yt-dlp exit raises RuntimeError even after entries were
+    yielded, so a truncated listing is never mistaken for a complete one.
+    """
+    proc = subprocess.Popen(
+        [str(YTDLP_EXE), "--flat-playlist", "-j", url],
+        stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True, errors="replace",
+    )
+    errors: list[str] = []
+    drain = threading.Thread(target=lambda: errors.extend(proc.stderr), daemon=True)
+    drain.start()
+    count = 0
+    finished = False
+    try:
+        for line in proc.stdout:
+            if cancel is not None and cancel.is_set():
+                break
+            line = line.strip()
+            if not line.startswith("{"):
+                continue
+            try:
+                entry = Entry.from_info(json.loads(line))
+            except ValueError:
+                continue
+            count += 1
+            yield entry
+        else:
+            finished = True
+    finally:
+        if not finished and proc.poll() is None:
+            proc.terminate()
+        proc.wait()
+        drain.join()
+    if not finished:
+        return
+    if proc.returncode != 0:
+        message = "".join(errors) or "yt-dlp failed to fetch playlist."
+        if count:
+            message = f"Listing stopped after {count} entries: {message}"
+        raise RuntimeError(message)
+    if not count:
+        raise RuntimeError("Invalid playlist URL or access denied.")
+
+
+def fetch_playlist(url: str) -> list[Entry]:
+    return list(iter_playlist(url))
+
+
+def parse_url_list(text: str) -> list[str]:
+    """URLs separated by whitespace/newlines; '#' comment lines and repeats dropped."""
+    urls = []
+    for line in text.splitlines():
+        if not line.lstrip().startswith("#"):
+            urls.extend(line.split())
+    return list(dict.fromkeys(urls))
+
+
+def fetch_playlists(urls: list[str], workers: int = DEFAULT_FETCH_WORKERS, fetch=None,
+                    cancel: threading.Event | None = None):
+    """
+    Enumerate several playlists at once with at most `workers` yt-dlp runs.
+
+    Yields (url, entries, error) in completion order, so the total time is
+    about that of the slowest playlist rather than the sum of all.
+    """
+    fetch = fetch or fetch_playlist
+    with ThreadPoolExecutor(max_workers=max(1, min(workers, len(urls)))) as pool:
+        futures = {pool.submit(fetch, url): url for url in urls}
+        try:
+            for fut in as_completed(futures):
+                if cancel is not None and cancel.is_set():
+                    return
+                try:
+                    yield futures[fut], fut.result(), None
+                except Exception as e:
+                    yield futures[fut], None, e
+        finally:
+            for fut in futures:
+                fut.cancel()
+
+
+def fmt_dur(sec: float | None) -> str:
+    if sec is None:
+        return "?"
+    m, s = divmod(int(sec), 60)
+    h, m = divmod(m, 60)
+    return f"{h:02d}:{m:02d}:{s:02d}" if h else f"{m:02d}:{s:02d}"
+
+
+def load_settings() -> dict:
+    if SETTINGS_FILE.exists():
+        return json.loads(SETTINGS_FILE.read_text())
+    return {}
+
+
+def save_settings(settings: dict):
+    SETTINGS_FILE.write_text(json.dumps(settings, indent=2))
+
+
+_PROGRESS_RE = re.compile(r"\[download\]\s*(?P<pct>[0-9.]+)%.*?at\s*(?P<spd>\S+)\s*ETA\s*(?P<eta>[0-9:]+)")
+_DEST_RE     = re.compile(r"^\[(?:download|ExtractAudio)\] Destination: (?P<path>.+)$")
+_INFO_RE     = re.compile(r"^\[info\] Writing video metadata as JSON to: (?P<path>.+)$")
+_CODEC_RE    = re.compile(r"^\[audiodl\] acodec (?P<acodec>\S+)")
+
+# Print the codec of the chosen stream; --no-quiet undoes the --quiet that
+# --print implies, so progress lines keep coming.
+_CODEC_ARGS = ["--print", "before_dl:[audiodl] acodec %(acodec)s", "--no-quiet"]
+
+# Batched runs read URLs from stdin and tag every line that matters with the
+# video ID, since one process's output now covers several videos.
+_BATCH_ARGS = [
+    "--batch-file", "-", "--ignore-errors", "--newline", "--no-quiet",
+    "--progress-template",
+    "download:[progress] %(info.id)s|%(progress._percent_str)s|%(progress._speed_str)s|%(progress._eta_str)s",
+    "--print", "before_dl:[audiodl] acodec %(acodec)s %(id)s",
+    "--print", "after_move:[audiodl] done %(id)s %(filesize,filesize_approx|0)s",
+]
+_TAGGED_PROGRESS_RE = re.compile(
+    r"^\[progress\] (?P<id>[\w-]+)\|\s*(?P<pct>[0-9.]+)%\|\s*(?P<spd>[^|]*?)\s*\|\s*(?P<eta>\S+)")
+_START_RE = re.compile(r"^\[audiodl\] acodec (?P<acodec>\S+) (?P<id>[\w-]+)")
+_DONE_RE  = re.compile(r"^\[audiodl\] done (?P<id>[\w-]+) (?P<size>[0-9.]+)")
+
+
+def video_url(video_id: str) -> str:
+    return f"https://www.youtube.com/watch?v={video_id}"
+
+
+def _format_args(audio_format: str) -> tuple[list[str], list[str]]:
+    """(stream selection args, ExtractAudio args) for a requested format."""
+    target, selector, _ = AUDIO_FORMATS.get(audio_format, (audio_format, "bestaudio/best", ()))
+    return ["-f", selector], ["-x", "--audio-format", target]
+
+
+def _thumbnail_args(thumbnails, embed: bool) -> list[str]:
+    """Embed (or, for pipeline stage 1, just write) the thumbnail, via the cache if there is one."""
+    if thumbnails is not None:
+        return thumbnails.ytdlp_args(embed)
+    return ["--embed-thumbnail"] if embed else ["--write-thumbnail"]
+
+
+def conversion_path(audio_format: str, acodec: str | None) -> str:
+    """REMUX if a stream in `acodec` is copied into `audio_format`, else TRANSCODE."""
+    copyable = AUDIO_FORMATS.get(audio_format, (None, None, ()))[2]
+    return REMUX if acodec and acodec.startswith(copyable) else TRANSCODE
+
+
+def _codec_watcher(video_id: str, q: queue.Queue, timer: StageTimer, audio_format: str, on_line=None):
+    """Wrap `on_line` so the [audiodl] acodec line decides and reports the path."""
+    def watch(line: str):
+        m = _CODEC_RE.search(line)
+        if m:
+            timer.path = conversion_path(audio_format, m.group("acodec"))
+            q.put(("path", video_id, timer.path))
+        elif on_line is not None:
+            on_line(line)
+    return watch
+
+
+def _run_ytdlp(cmd: list[str], video_id: str, q: queue.Queue, timer: StageTimer,
+               cancel: threading.Event | None = None, on_output=None, on_line=None,
+               governor=None) -> int:
+    """Run yt-dlp, forwarding progress/warnings to `q`; returns the exit code."""
+    if governor is not None:
+        cmd = [cmd[0], *governor.rate_args(), *cmd[1:]]
+    proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True)
+    for line in proc.stdout:
+        if cancel is not None and cancel.is_set():
+            proc.terminate()
+            break
+        timer.feed(line)
+        m = _PROGRESS_RE.search(line)
+        if m:
+            pct = float(m.group("pct"))
+            spd = m.group("spd")
+            eta = m.group("eta")
+            q.put(("progress", video_id, pct, spd, eta))
+            if governor is not None:
+                if pct >= 100:
+                    # Post-processing prints no progress; it is not a stall.
+                    governor.finished(video_id)
+                else:
+                    governor.observe(video_id, spd)
+        elif "WARNING: [AtomicParsley]" in line:
+            q.put(("warning", line.strip()))
+        elif governor is not None:
+            if line.startswith("[ExtractAudio]"):
+                governor.finished(video_id)
+            governor.check_line(line)
+        if on_output is not None:
+            dest = _DEST_RE.search(line)
+            if dest:
+                on_output(dest.group("path").strip())
+        if on_line is not None:
+            on_line(line)
+    proc.wait()
+    if governor is not None:
+        governor.finished(video_id)
+    return proc.returncode
+
+
+def _finish(video_id: str, out_dir: Path, q: queue.Queue, timer: StageTimer, ok: bool, metrics=None) -> bool:
+    record = timer.finish(ok)
+    q.put(("timing", video_id, record))
+    if metrics is not None:
+        metrics.record(record)
+    if ok:
+        DownloadArchive.for_directory(out_dir).add(video_id)
+    return ok
+
+
+def download_audio(video_id: str, out_dir: Path, q: queue.Queue, audio_format: str,
+                   on_state=None, cancel: threading.Event | None = None, on_output=None,
+                   metrics=None, governor=None, thumbnails=None) -> bool:
+    """Download and convert one video in a single yt-dlp process."""
+    select, extract = _format_args(audio_format)
+    cmd = [
+        str(YTDLP_EXE),
+        *select, *extract, *_CODEC_ARGS,
+        *_thumbnail_args(thumbnails, embed=True), "--add-metadata",
+        "--ffmpeg-location", str(FFMPEG_EXE),
+        "-P", str(out_dir),
+        video_url(video_id),
+    ]
+
+    def on_line(line: str):
+        if line.startswith("[ExtractAudio]") and on_state is not None:
+            on_state(POSTPROCESSING)
+
+    timer = StageTimer(video_id)
+    on_line = _codec_watcher(video_id, q, timer, audio_format, on_line)
+    rc = _run_ytdlp(cmd, video_id, q, timer, cancel, on_output, on_line, governor)
+    return _finish(video_id, out_dir, q, timer, rc == 0, metrics)
+
+
+def fetch_audio(video_id: str, out_dir: Path, q: queue.Queue, audio_format: str,
+                cancel: threading.Event | None = None, on_output=None, metrics=None, governor=None,
+                thumbnails=None):
+    """
+    Pipeline stage 1: fetch the native audio stream, thumbnail and info JSON.
+
+    The stream is picked to match `audio_format` where one exists, so the
+    conversion stage can remux instead of transcoding. Returns
+    `(info_json_path, timer)` for `convert_audio`, or None on failure.
+    Nothing is transcoded here, so the network worker is free again as soon
+    as the bytes have arrived.
+    """
+    select, _ = _format_args(audio_format)
+    cmd = [
+        str(YTDLP_EXE),
+        *select, *_CODEC_ARGS,
+        "--write-info-json", *_thumbnail_args(thumbnails, embed=False),
+        "--ffmpeg-location", str(FFMPEG_EXE),
+        "-P", str(out_dir),
+        video_url(video_id),
+    ]
+    paths = {}
+
+    def on_line(line: str):
+        m = _INFO_RE.search(line)
+        if m:
+            paths["info"] = m.group("path").strip()
+        else:
+            m = _DEST_RE.search(line)
+            if m:
+                paths.setdefault("media", m.group("path").strip())
+
+    timer = StageTimer(video_id)
+    on_line = _codec_watcher(video_id, q, timer, audio_format, on_line)
+    rc = _run_ytdlp(cmd, video_id, q, timer, cancel, on_output, on_line, governor)
+    info = paths.get("info")
+    if info is None and "media" in paths:
+        info = str(Path(paths["media"]).with_suffix(".info.json"))
+    if rc != 0 or info is None or not Path(info).exists():
+        _finish(video_id, out_dir, q, timer, False, metrics)
+        return None
+    timer.enter("handoff")
+    return info, timer
+
+
+def convert_audio(video_id: str, fetched, out_dir: Path, q: queue.Queue, audio_format: str,
+                  on_state=None, cancel: threading.Event | None = None, on_output=None,
+                  metrics=None, thumbnails=None, extra_args: list[str] | None = None) -> bool:
+    """
+    Pipeline stage 2: convert, tag and embed the thumbnail of a fetched video.
+
+    yt-dlp is re-run on the saved info JSON; it finds the media file already
+    downloaded and only runs its ffmpeg post-processors, which copy the
+    stream instead of re-encoding it when the codec already fits.
+    `extra_args` are passed on to yt-dlp, e.g. --postprocessor-args.
+    """
+    info, timer = fetched
+    select, extract = _format_args(audio_format)
+    # Without -f yt-dlp selects formats again and may pick (and download)
+    # another stream than the one stage 1 fetched.
+    format_id = _info_field(info, "format_id")
+    if format_id:
+        select = ["-f", str(format_id)]
+    cmd = [
+        str(YTDLP_EXE),
+        "--load-info-json", info,
+        *select, *extract,
+        *_thumbnail_args(thumbnails, embed=True), "--add-metadata",
+        *(extra_args or []),
+        "--ffmpeg-location", str(FFMPEG_EXE),
+        "-P", str(out_dir),
+    ]
+    if on_state is not None:
+        on_state(POSTPROCESSING)
+    rc = _run_ytdlp(cmd, video_id, q, timer, cancel, on_output)
+    if rc == 0:
+        Path(info).unlink(missing_ok=True)
+    return _finish(video_id, out_dir, q, timer, rc == 0, metrics)
+
+
+def _info_field(info_json: str, key: str):
+    try:
+        with open(info_json, encoding="utf-8") as fh:
+            return json.load(fh).get(key)
+    except (OSError, ValueError, AttributeError):
+        return None
+
+
+def fetched_media(info_json: str) -> Path | None:
+    """The media file a pipeline stage 1 run downloaded, from its info JSON."""
+    name = _info_field(info_json, "_filename")
+    if not isinstance(name, str):
+        return None
+    path = Path(name)
+    return path if path.exists() else None
+
+
+def download_batch(video_ids: list[str], out_dir: Path, q: queue.Queue, audio_format: str,
+                   pipeline: bool = False, on_state=None, on_done=None,
+                   cancel: threading.Event | None = None, on_output=None, metrics=None,
+                   governor=None, thumbnails=None):
+    """
+    Run several videos through one yt-dlp process fed on stdin.
+
+    Interpreter start-up, extractor loading and the HTTPS session are paid
+    once per batch instead of once per video. Output is attributed to the
+    video named by the "Extracting URL" line that starts it and by the ID
+    tags of --progress-template / --print lines.
+
+    `on_state(video_id, state)` and `on_output(video_id, path)` take the
+    video ID. `on_done(video_id, result)` is called as each video finishes,
+    with what download_audio (or fetch_audio, with `pipeline`) would have
+    returned; videos never reported there failed or were not reached.
+    """
+    select, extract = _format_args(audio_format)
+    cmd = [str(YTDLP_EXE), *select, *_BATCH_ARGS]
+    if governor is not None:
+        cmd += governor.rate_args()
+    if pipeline:
+        cmd += ["--write-info-json", *_thumbnail_args(thumbnails, embed=False)]
+    else:
+        cmd += [*extract, *_thumbnail_args(thumbnails, embed=True), "--add-metadata"]
+    cmd += ["--ffmpeg-location", str(FFMPEG_EXE), "-P", str(out_dir)]
+
+    timers: dict[str, StageTimer] = {}
+    infos: dict[str, str] = {}
+    finished: set[str] = set()
+    current = None
+
+    def start(vid: str):
+        nonlocal current
+        current = vid
+        if vid not in timers:
+            timers[vid] = StageTimer(vid)
+            if on_state is not None:
+                on_state(vid, DOWNLOADING)
+
+    proc = subprocess.Popen(cmd, stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+                            stderr=subprocess.STDOUT, text=True)
+    proc.stdin.write("".join(video_url(vid) + "\n" for vid in video_ids))
+    proc.stdin.close()
+    for line in proc.stdout:
+        if cancel is not None and cancel.is_set():
+            proc.terminate()
+            break
+        m = _TAGGED_PROGRESS_RE.search(line)
+        if m:
+            pct = float(m.group("pct"))
+            q.put(("progress", m.group("id"), pct, m.group("spd"), m.group("eta")))
+            if governor is not None:
+                if pct >= 100:
+                    governor.finished(m.group("id"))
+                else:
+                    governor.observe(m.group("id"), m.group("spd"))
+            continue
+        if governor is not None:
+            governor.check_line(line)
+        if line.startswith("[youtube] Extracting URL:"):
+            vid = next((v for v in video_ids if v not in timers and v in line), None)
+            if vid is not None:
+                start(vid)
+        m = _START_RE.search(line)
+        if m:
+            start(m.group("id"))
+            timers[current].path = conversion_path(audio_format, m.group("acodec"))
+            q.put(("path", current, timers[current].path))
+            continue
+        if current is None:
+            continue
+        timer = timers[current]
+        timer.feed(line)
+        m = _DONE_RE.search(line)
+        if m and m.group("id") in timers:
+            vid = m.group("id")
+            timer = timers[vid]
+            if not timer.bytes:
+                timer.bytes = int(float(m.group("size")))
+            finished.add(vid)
+            if governor is not None:
+                governor.finished(vid)
+            if not pipeline:
+                _finish(vid, out_dir, q, timer, True, metrics)
+                result = True
+            elif Path(infos.get(vid, "")).is_file():
+                timer.enter("handoff")
+                result = (infos[vid], timer)
+            else:
+                _finish(vid, out_dir, q, timer, False, metrics)
+                continue
+            if on_done is not None:
+                on_done(vid, result)
+            continue
+        if "WARNING: [AtomicParsley]" in line:
+            q.put(("warning", line.strip()))
+        elif line.startswith("[ExtractAudio]"):
+            if governor is not None:
+                governor.finished(current)
+            if on_state is not None:
+                on_state(current, POSTPROCESSING)
+        m = _INFO_RE.search(line)
+        if m:
+            infos[current] = m.group("path").strip()
+        if on_output is not None:
+            dest = _DEST_RE.search(line)
+            if dest:
+                on_output(current, dest.group("path").strip())
+    proc.wait()
+    for vid, timer in timers.items():
+        if vid not in finished:
+            if governor is not None:
+                governor.finished(vid)
+            _finish(vid, out_dir, q, timer, False, metrics)
+
+
+def build_scheduler(out_dir: Path, q: queue.Queue, audio_format: str, workers: int = DEFAULT_CONCURRENCY,
+                    retries: int = DEFAULT_RETRIES, pipeline: bool = DEFAULT_PIPELINE,
+                    cpu_workers: int | None = None, batch_size: int = DEFAULT_BATCH_SIZE,
+                    on_change=None, on_output=None, metrics=None,
+                    rate_limit: int | None = None, adaptive: bool = False,
+                    library=None, thumbnails=None, normalizer=None) -> DownloadScheduler:
+    """
+    Wire the download functions into a scheduler.
+
+    `on_output(video_id, path)` receives every destination path yt-dlp
+    reports. With `pipeline`, downloads use fetch_audio/convert_audio and a
+    separate pool of `cpu_workers` (default: CPU count) converters. Only
+    videos that have to be transcoded go to that pool; remuxes are converted
+    right away by the network worker. The second yt-dlp start per video
+    makes pipelining a loss when most videos are remuxed (the aac default),
+    so it is off unless asked for. With
+    `batch_size` > 1, first attempts go through download_batch in chunks of
+    up to that many videos.
+
+    `rate_limit` (bytes/s, shared by all downloads) and `adaptive`
+    concurrency, with `workers` as the ceiling, are handled by a
+    NetworkGovernor that reports to `q`.
+
+    With a `library` (audiodl.library.Library), videos it already has in
+    this format are linked into `out_dir` instead of downloaded, and every
+    finished file is added to it.
+
+    With `thumbnails` (audiodl.thumbnails.ThumbnailCache), yt-dlp takes the
+    thumbnails to embed from that cache and leaves new ones there. The cache
+    is trimmed to its size limit here, before the run starts.
+
+    With a `normalizer` (audiodl.loudness.Normalizer), every finished file
+    is measured and tagged while its job is still post-processing. In its
+    "apply" mode, pipeline conversions that transcode anyway get the gain
+    applied in that same encode instead. Results are reported to `q` as
+    ("loudness", video_id, result).
+    """
+    governor = None
+    if rate_limit or adaptive:
+        governor = NetworkGovernor(workers, q, rate_limit=rate_limit, adaptive=adaptive)
+    if thumbnails is not None:
+        thumbnails.evict()
+
+    # The last destination yt-dlp reports for a video is its final file.
+    final_paths: dict[str, str] = {}
+
+    def record_output(vid, path):
+        final_paths[vid] = path
+        if on_output is not None:
+            on_output(vid, path)
+
+    def output_cb(vid):
+        return lambda path: record_output(vid, path)
+
+    def record_change(vid, state):
+        if state == DONE and library is not None and vid in final_paths:
+            library.add(vid, audio_format, final_paths.pop(vid))
+        if state == DONE and thumbnails is not None:
+            thumbnails.touch(vid)
+        if on_change is not None:
+            on_change(vid, state)
+
+    def normalize(vid, applied=False):
+        path = final_paths.get(vid)
+        if normalizer is None or path is None:
+            return
+        try:
+            q.put(("loudness", vid, normalizer.process(vid, Path(path), applied)))
+        except (OSError, RuntimeError) as e:
+            q.put(("warning", f"{vid}: loudness analysis failed: {e}"))
+
+    def download(vid, on_state, cancel):
+        ok = download_audio(
+            vid, out_dir, q, audio_format, on_state=on_state, cancel=cancel,
+            on_output=output_cb(vid), metrics=metrics, governor=governor, thumbnails=thumbnails)
+        if ok:
+            normalize(vid)
+        return ok
+
+    def convert(vid, fetched, on_state, cancel):
+        extra = []
+        if normalizer is not None and normalizer.mode == "apply" and fetched[1].path == TRANSCODE:
+            source = fetched_media(fetched[0])
+            if source is not None:
+                try:
+                    extra = normalizer.extract_args(vid, source)
+                except (OSError, RuntimeError) as e:
+                    q.put(("warning", f"{vid}: loudness analysis failed: {e}"))
+        ok = convert_audio(
+            vid, fetched, out_dir, q, audio_format, on_state=on_state, cancel=cancel,
+            on_output=output_cb(vid), metrics=metrics, thumbnails=thumbnails, extra_args=extra)
+        if ok:
+            normalize(vid, applied=bool(extra))
+        return ok
+
+    reuse_fn = None
+    if library is not None:
+        def reuse_fn(vid):
+            hit = library.materialize(vid, audio_format, out_dir)
+            if hit is None:
+                return False
+            DownloadArchive.for_directory(out_dir).add(vid)
+            q.put(("path", vid, LIBRARY))
+            if on_output is not None:
+                on_output(vid, str(hit[0]))
+            return True
+
+    batch_fn = None
+    if batch_size > 1:
+        def batch_fn(ids, on_state, on_done, cancel):
+            # Finished videos are taken over by a helper thread, so the
+            # batch's reader loop keeps draining yt-dlp's output meanwhile.
+            finished: queue.Queue = queue.Queue()
+
+            def batch_done():
+                while (item := finished.get()) is not None:
+                    vid, result = item
+                    try:
+                        if not pipeline:
+                            normalize(vid)
+                        elif result[1].path == REMUX:
+                            # As in fetch(): no trip through the conversion pool.
+                            result = convert(vid, result, lambda s, v=vid: on_state(v, s), cancel)
+                            if not result:
+                                continue
+                        on_done(vid, result)
+                    except Exception as e:
+                        q.put(("warning", f"{vid}: {e}"))
+
+            helper = threading.Thread(target=batch_done, daemon=True)
+            helper.start()
+            try:
+                download_batch(
+                    ids, out_dir, q, audio_format, pipeline=pipeline, on_state=on_state,
+                    on_done=lambda vid, result: finished.put((vid, result)), cancel=cancel,
+                    on_output=record_output, metrics=metrics, governor=governor, thumbnails=thumbnails)
+            finally:
+                finished.put(None)
+                helper.join()
+
+    if not pipeline:
+        return DownloadScheduler(
+            download, q, workers=workers, retries=retries, on_change=record_change,
+            batch_fn=batch_fn, batch_size=batch_size, governor=governor, reuse_fn=reuse_fn,
+        )
+
+    def fetch(vid, on_state, cancel):
+        fetched = fetch_audio(
+            vid, out_dir, q, audio_format, cancel=cancel, on_output=output_cb(vid), metrics=metrics,
+            governor=governor, thumbnails=thumbnails)
+        if fetched is not None and fetched[1].path == REMUX:
+            # A stream copy is not worth a trip through the conversion pool.
+            return convert(vid, fetched, on_state, cancel)
+        return fetched
+
+    return DownloadScheduler(
+        fetch, q, workers=workers, retries=retries, on_change=record_change,
+        batch_fn=batch_fn, batch_size=batch_size, governor=governor, reuse_fn=reuse_fn,
+        convert_fn=convert,
+        cpu_workers=cpu_workers,
+    )
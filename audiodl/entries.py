@@ -0,0 +1,53 @@
+"""
+Compact in-memory playlist entries.
+
+yt-dlp's flat listing has a few dozen keys per video (thumbnail lists, URLs,
+channel info) of which the app reads a handful. `Entry` keeps only those,
+in `__slots__`, and interns the strings a playlist repeats on every row
+(uploader, playlist title, source labels) so 50k rows share one copy each.
+
+The per-row selected/downloaded flags stay in the GUI's parallel bool lists,
+which are already one compact column per flag.
+"""
+
+import sys
+
+
+def _intern(text) -> str | None:
+    return sys.intern(text) if isinstance(text, str) and text else None
+
+
+class Entry:
+    __slots__ = ("id", "title", "duration", "uploader", "playlist", "sources")
+
+    def __init__(self, id: str | None, title: str | None = None, duration: float | None = None,
+                 uploader: str | None = None, playlist: str | None = None, sources: list[str] | None = None):
+        self.id = id
+        self.title = title
+        self.duration = duration
+        self.uploader = uploader
+        self.playlist = playlist
+        self.sources = sources
+
+    @classmethod
+    def from_info(cls, info: dict) -> "Entry":
+        """Keep what the app uses of a yt-dlp entry dict (or a cached record)."""
+        sources = info.get("sources")
+        return cls(
+            info.get("id"),
+            info.get("title"),
+            info.get("duration"),
+            _intern(info.get("uploader") or info.get("channel")),
+            _intern(info.get("playlist_title") or info.get("playlist")),
+            [_intern(s) for s in sources] if sources else None,
+        )
+
+    def to_dict(self) -> dict:
+        """JSON-friendly form for the playlist cache; unset fields are left out."""
+        return {k: v for k in self.__slots__ if (v := getattr(self, k)) is not None}
+
+    def with_sources(self, sources: list[str]) -> "Entry":
+        return Entry(self.id, self.title, self.duration, self.uploader, self.playlist, sources)
+
+    def __repr__(self) -> str:
+        return f"Entry({self.id!r}, {self.title!r})"
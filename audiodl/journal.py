@@ -0,0 +1,136 @@
+"""
+Crash-safe journal of queued downloads.
+
+The journal is a small JSON-lines file next to settings.json that records,
+for every queued video, its state, output directory, format and (once
+known) the output path. Each change is appended as one short line, so the
+download workers never wait on a rewrite of the whole file; the log is
+replayed and compacted back to one line per unfinished job when it is
+loaded and when a run finishes. After a crash or an early exit the next run
+can offer to resume whatever was not finished. yt-dlp picks up its own
+.part files when the same video is downloaded into the same directory again.
+"""
+
+import json
+import os
+import threading
+import time
+from pathlib import Path
+
+from audiodl.scheduler import DONE, CANCELLED, FAILED, QUEUED, DOWNLOADING, DOWNLOADED, POSTPROCESSING
+
+RESUMABLE_STATES = (QUEUED, DOWNLOADING, DOWNLOADED, POSTPROCESSING, FAILED)
+
+
+class JobJournal:
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self._lock = threading.Lock()
+        self._closed = False
+        self._fh = None
+        self.jobs: dict[str, dict] = self._replay()
+        with self._lock:
+            self._compact()
+
+    def _replay(self) -> dict[str, dict]:
+        try:
+            text = self.path.read_text(encoding="utf-8")
+        except OSError:
+            return {}
+        jobs: dict[str, dict] = {}
+        for line in text.splitlines():
+            try:
+                rec = json.loads(line)
+                vid = rec.pop("id")
+            except (ValueError, KeyError, AttributeError):
+                continue   # torn last line after a crash
+            if rec.get("state") in (DONE, CANCELLED):
+                jobs.pop(vid, None)
+            elif "out_dir" in rec:
+                jobs[vid] = rec
+            elif vid in jobs:
+                jobs[vid].update(rec)
+        return jobs
+
+    def add_jobs(self, ids: list[str], out_dir: Path, audio_format: str):
+        with self._lock:
+            if self._closed:
+                return
+            now = time.time()
+            lines = []
+            for vid in ids:
+                self.jobs[vid] = {
+                    "state": QUEUED, "out_dir": str(out_dir), "format": audio_format,
+                    "path": None, "updated": now,
+                }
+                lines.append({"id": vid, **self.jobs[vid]})
+            self._append(lines)
+
+    def update(self, video_id: str, state: str):
+        with self._lock:
+            if self._closed or video_id not in self.jobs:
+                return
+            now = time.time()
+            if state in (DONE, CANCELLED):
+                del self.jobs[video_id]
+            else:
+                self.jobs[video_id]["state"] = state
+                self.jobs[video_id]["updated"] = now
+            self._append([{"id": video_id, "state": state, "updated": now}])
+
+    def set_path(self, video_id: str, path: str):
+        with self._lock:
+            job = self.jobs.get(video_id)
+            if self._closed or job is None or job["path"] == path:
+                return
+            job["path"] = path
+            self._append([{"id": video_id, "path": path}])
+
+    def pending(self) -> dict[tuple[str, str], list[str]]:
+        """Unfinished video IDs grouped by (out_dir, format)."""
+        groups: dict[tuple[str, str], list[str]] = {}
+        with self._lock:
+            for vid, job in self.jobs.items():
+                if job.get("state") in RESUMABLE_STATES:
+                    groups.setdefault((job["out_dir"], job["format"]), []).append(vid)
+        return groups
+
+    def compact(self):
+        """Rewrite the log as one line per unfinished job, e.g. when a run finishes."""
+        with self._lock:
+            if not self._closed:
+                self._compact()
+
+    def clear(self):
+        with self._lock:
+            if self._closed:
+                return
+            self.jobs.clear()
+            self._compact()
+
+    def close(self):
+        """Stop recording changes, e.g. while shutting down mid-download."""
+        with self._lock:
+            self._closed = True
+            if self._fh is not None:
+                self._fh.close()
+                self._fh = None
+
+    def _append(self, records: list[dict]):
+        if self._fh is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self._fh = open(self.path, "a", encoding="utf-8")
+        self._fh.write("".join(json.dumps(rec) + "\n" for rec in records))
+        self._fh.flush()
+
+    def _compact(self):
+        if self._fh is not None:
+            self._fh.close()
+            self._fh = None
+        if not self.jobs:
+            self.path.unlink(missing_ok=True)
+            return
+        tmp = self.path.with_name(self.path.name + ".tmp")
+        tmp.write_text("".join(json.dumps({"id": vid, **job}) + "\n" for vid, job in self.jobs.items()),
+                       encoding="utf-8")
+        os.replace(tmp, self.path)
@@ -0,0 +1,147 @@
+"""
+Global index of finished audio files, shared by all output directories.
+
+Every successful download is recorded as (video ID, format) -> file paths
+in an append-only JSON-lines file. When the same video is wanted again in
+the same format for another folder, the file is materialized there instead
+of being downloaded and converted again: as a reflink (copy-on-write clone)
+where the filesystem supports it, else a hardlink, else a plain copy.
+
+With `hash_files` the SHA-256 of each file is recorded as well, so a file
+whose size or mtime changed since is only reused if its content did not.
+"""
+
+import hashlib
+import json
+import os
+import shutil
+import threading
+import time
+from pathlib import Path
+
+LINK_METHODS = ("reflink", "hardlink", "copy")
+
+_FICLONE = 0x40049409  # Linux ioctl, supported by btrfs, XFS, bcachefs...
+
+
+def file_sha256(path: Path) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as fh:
+        for chunk in iter(lambda: fh.read(1 << 20), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def _reflink(src: Path, dest: Path):
+    import fcntl  # not available on Windows
+    with open(src, "rb") as s, open(dest, "wb") as d:
+        try:
+            fcntl.ioctl(d.fileno(), _FICLONE, s.fileno())
+        except OSError:
+            d.close()
+            dest.unlink(missing_ok=True)
+            raise
+
+
+def link_file(src: Path, dest: Path, methods=LINK_METHODS) -> str:
+    """Make `dest` a copy of `src` with the first method that works; returns it."""
+    for method in methods:
+        try:
+            if method == "reflink":
+                _reflink(src, dest)
+            elif method == "hardlink":
+                os.link(src, dest)
+            else:
+                shutil.copy2(src, dest)
+            return method
+        except (OSError, ImportError):
+            continue
+    raise OSError(f"Could not link or copy {src} to {dest}")
+
+
+class Library:
+    def __init__(self, path: Path, hash_files: bool = False, methods=LINK_METHODS):
+        self.path = Path(path)
+        self.hash_files = hash_files
+        self.methods = tuple(methods)
+        self._lock = threading.Lock()
+        self._items: dict[tuple[str, str], dict] = {}
+        try:
+            with open(self.path, encoding="utf-8") as fh:
+                for line in fh:
+                    try:
+                        rec = json.loads(line)
+                    except ValueError:
+                        continue
+                    self._apply(rec)
+        except OSError:
+            pass
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    def add(self, video_id: str, audio_format: str, path: str | Path):
+        """Record a finished file; appends a single line to the index."""
+        path = Path(path).resolve()
+        try:
+            st = path.stat()
+        except OSError:
+            return
+        rec = {
+            "id": video_id, "format": audio_format, "path": str(path),
+            "size": st.st_size, "mtime": st.st_mtime_ns, "added": round(time.time(), 3),
+        }
+        if self.hash_files:
+            rec["sha256"] = file_sha256(path)
+        with self._lock:
+            self._apply(rec)
+            self._append(rec)
+
+    def lookup(self, video_id: str, audio_format: str) -> Path | None:
+        """An existing, unchanged file for this video and format, if any."""
+        with self._lock:
+            item = self._items.get((video_id, audio_format))
+            files = list(item["files"].items()) if item else []
+        for path, meta in files:
+            if self._still_valid(Path(path), meta):
+                return Path(path)
+        return None
+
+    def materialize(self, video_id: str, audio_format: str, out_dir: Path) -> tuple[Path, str] | None:
+        """
+        Put the library's file for this video into `out_dir`.
+
+        Returns (path, method), where method is "existing" if the file is
+        already there, or None if the library has no usable file.
+        """
+        src = self.lookup(video_id, audio_format)
+        if src is None:
+            return None
+        out_dir = Path(out_dir).resolve()
+        dest = out_dir / src.name
+        if src.parent == out_dir or dest.exists():
+            return dest, "existing"
+        method = link_file(src, dest, self.methods)
+        self.add(video_id, audio_format, dest)
+        return dest, method
+
+    # ---------------- INTERNALS ----------------
+    def _apply(self, rec: dict):
+        item = self._items.setdefault((rec["id"], rec["format"]), {"files": {}})
+        item["files"][rec["path"]] = {k: rec.get(k) for k in ("size", "mtime", "sha256")}
+
+    def _append(self, rec: dict):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with open(self.path, "a", encoding="utf-8") as fh:
+            fh.write(json.dumps(rec) + "\n")
+
+    def _still_valid(self, path: Path, meta: dict) -> bool:
+        try:
+            st = path.stat()
+        except OSError:
+            return False
+        if st.st_size == meta["size"] and st.st_mtime_ns == meta["mtime"]:
+            return True
+        # Changed since it was recorded: only trust it if the content is
+        # provably the same.
+        return bool(meta.get("sha256")) and file_sha256(path) == meta["sha256"]
@@ -0,0 +1,166 @@
+"""
+Loudness measurement and ReplayGain tagging for finished downloads.
+
+A single ffmpeg pass with the ebur128 filter (true peak enabled) gives the
+integrated loudness, loudness range and true peak of a file, instead of the
+two decodes of loudnorm's two-pass mode. Measurements are cached per video
+ID in a JSON-lines file, so exporting the same video to another format does
+not analyze it again.
+
+Modes:
+  tag    write ReplayGain 2.0 tags (plus R128_TRACK_GAIN for Opus) into the
+         finished file with a stream copy; the audio is not touched. M4A
+         files are measured but left untagged (see _TAG_ARGS).
+  apply  scale the audio by the gain inside the conversion that runs anyway
+         (pipeline mode, transcoded videos). Streams that are only remuxed,
+         and single-process downloads, are tagged instead.
+"""
+
+import json
+import os
+import re
+import subprocess
+import threading
+import time
+from pathlib import Path
+
+MODES = ("tag", "apply")
+DEFAULT_TARGET_LUFS = -18.0   # ReplayGain 2.0 reference level
+MAX_TRUE_PEAK       = -1.0    # dBTP ceiling when gain is applied
+R128_REFERENCE      = -23.0   # Opus R128_*_GAIN tags are relative to this
+
+_NUM = r"(-?[0-9.]+|-inf)"
+_INTEGRATED_RE = re.compile(rf"^\s*I:\s+{_NUM} LUFS", re.M)
+_RANGE_RE      = re.compile(rf"^\s*LRA:\s+{_NUM} LU\b", re.M)
+_PEAK_RE       = re.compile(rf"^\s*Peak:\s+{_NUM} dBFS", re.M)
+
+# Containers that can carry the tags; ffmpeg writes them as Vorbis comments
+# or ID3 TXXX frames. M4A is deliberately missing: ffmpeg's mp4 muxer drops
+# REPLAYGAIN_* from the iTunes ilst atoms, and -movflags use_metadata_tags
+# would rewrite every tag (and lose the cover) as mdta keys most players
+# ignore. ReplayGain in M4A needs freeform ----:com.apple.iTunes atoms.
+_TAG_ARGS = {
+    ".flac": [],
+    ".opus": [],
+    ".ogg":  [],
+    ".mp3":  ["-id3v2_version", "3"],
+}
+
+
+def _last_float(regex: re.Pattern, text: str) -> float | None:
+    found = regex.findall(text)
+    if not found:
+        return None
+    return float("-inf") if found[-1] == "-inf" else float(found[-1])
+
+
+def measure(path: Path, ffmpeg: Path) -> dict:
+    """Integrated loudness (LUFS), loudness range (LU) and true peak (dBFS) of a file."""
+    proc = subprocess.run(
+        [str(ffmpeg), "-hide_banner", "-nostats", "-i", str(path),
+         "-map", "0:a:0", "-af", "ebur128=peak=true", "-f", "null", "-"],
+        capture_output=True, text=True, errors="replace",
+    )
+    integrated = _last_float(_INTEGRATED_RE, proc.stderr)
+    if proc.returncode != 0 or integrated is None:
+        raise RuntimeError(proc.stderr.strip().splitlines()[-1] if proc.stderr.strip()
+                           else f"ffmpeg exited with {proc.returncode}")
+    return {
+        "integrated_lufs": integrated,
+        "lra": _last_float(_RANGE_RE, proc.stderr),
+        "true_peak_dbfs": _last_float(_PEAK_RE, proc.stderr),
+    }
+
+
+def track_gain(m: dict, target_lufs: float) -> float:
+    return target_lufs - m["integrated_lufs"]
+
+
+def safe_gain(m: dict, target_lufs: float) -> float:
+    """Gain towards the target that keeps the true peak below MAX_TRUE_PEAK."""
+    gain = track_gain(m, target_lufs)
+    if m.get("true_peak_dbfs") is not None:
+        gain = min(gain, MAX_TRUE_PEAK - m["true_peak_dbfs"])
+    return gain
+
+
+def replaygain_tags(m: dict, target_lufs: float, suffix: str) -> dict[str, str]:
+    tags = {"REPLAYGAIN_TRACK_GAIN": f"{track_gain(m, target_lufs):.2f} dB"}
+    if m.get("true_peak_dbfs") is not None:
+        tags["REPLAYGAIN_TRACK_PEAK"] = f"{10 ** (m['true_peak_dbfs'] / 20):.6f}"
+    if suffix in (".opus", ".ogg"):
+        # Q7.8 fixed point, see RFC 7845 section 5.2.1.
+        tags["R128_TRACK_GAIN"] = str(round((R128_REFERENCE - m["integrated_lufs"]) * 256))
+    return tags
+
+
+def write_tags(path: Path, tags: dict[str, str], ffmpeg: Path):
+    """Add metadata tags to `path` in place, copying every stream as is."""
+    tmp = path.with_name(f"{path.stem}.tags{path.suffix}")
+    suffix = path.suffix.lower()
+    cmd = [str(ffmpeg), "-v", "error", "-y", "-i", str(path), "-map", "0", "-c", "copy", *_TAG_ARGS[suffix]]
+    # Ogg keeps its comments on the stream rather than the container.
+    target = "-metadata:s:a:0" if suffix in (".opus", ".ogg") else "-metadata"
+    for key, value in tags.items():
+        cmd += [target, f"{key}={value}"]
+    proc = subprocess.run([*cmd, str(tmp)], capture_output=True, text=True, errors="replace")
+    if proc.returncode != 0:
+        tmp.unlink(missing_ok=True)
+        raise RuntimeError(proc.stderr.strip() or f"ffmpeg exited with {proc.returncode}")
+    os.replace(tmp, path)
+
+
+class Normalizer:
+    def __init__(self, cache_path: Path, mode: str = "tag", target_lufs: float = DEFAULT_TARGET_LUFS,
+                 ffmpeg: Path | None = None):
+        if mode not in MODES:
+            raise ValueError(f"Unknown normalization mode: {mode!r}")
+        self.cache_path = Path(cache_path)
+        self.mode = mode
+        self.target_lufs = float(target_lufs)
+        self.ffmpeg = ffmpeg or "ffmpeg"
+        self._lock = threading.Lock()
+        self._cache: dict[str, dict] = {}
+        try:
+            with open(self.cache_path, encoding="utf-8") as fh:
+                for line in fh:
+                    try:
+                        rec = json.loads(line)
+                        self._cache[rec.pop("id")] = rec
+                    except (ValueError, KeyError):
+                        continue
+        except OSError:
+            pass
+
+    def measurement(self, video_id: str, path: Path) -> dict:
+        """Cached measurement for the video, analyzing `path` the first time."""
+        with self._lock:
+            cached = self._cache.get(video_id)
+        if cached is not None:
+            return cached
+        m = measure(path, self.ffmpeg)
+        m["measured"] = round(time.time(), 3)
+        with self._lock:
+            self._cache[video_id] = m
+            self.cache_path.parent.mkdir(parents=True, exist_ok=True)
+            with open(self.cache_path, "a", encoding="utf-8") as fh:
+                fh.write(json.dumps({"id": video_id, **m}) + "\n")
+        return m
+
+    def extract_args(self, video_id: str, source: Path) -> list[str]:
+        """yt-dlp arguments that apply the gain in the ExtractAudio encode."""
+        gain = safe_gain(self.measurement(video_id, source), self.target_lufs)
+        return ["--postprocessor-args", f"ExtractAudio:-af volume={gain:.2f}dB"]
+
+    def process(self, video_id: str, path: Path, applied: bool = False) -> dict:
+        """
+        Measure (or look up) a finished file and tag it unless its gain was
+        already applied. Returns the measurement plus what was done.
+        """
+        m = self.measurement(video_id, path)
+        tagged = False
+        if not applied and path.suffix.lower() in _TAG_ARGS:
+            write_tags(path, replaygain_tags(m, self.target_lufs, path.suffix.lower()), self.ffmpeg)
+            tagged = True
+        gain = safe_gain(m, self.target_lufs) if applied else track_gain(m, self.target_lufs)
+        return {**m, "gain_db": round(gain, 2), "applied": applied, "tagged": tagged}
@@ -0,0 +1,200 @@
+"""
+Per-stage timing of downloads and aggregate counters.
+
+`StageTimer` turns the output of one yt-dlp run into a record like
+
+  {"id": "...", "ok": true, "total_s": 9.1, "bytes": 4194304, "path": "remux",
+   "stages": {"spawn": 0.4, "info": 1.2, "thumbnail": 0.3, "download": 5.0,
+              "extract": 1.9, "metadata": 0.1, "embed_thumbnail": 0.2}}
+
+and `Metrics` collects those records into counters that can be written as a
+JSON-lines log, a Prometheus text file and/or served over local HTTP.
+
+When downloads are pipelined, the time between the two yt-dlp runs
+(waiting for a conversion slot and starting the second process) is
+reported as "handoff".
+"""
+
+import json
+import os
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+# Output prefix -> stage name. Lines that match nothing stay in the
+# current stage.
+STAGE_PREFIXES = (
+    ("[download]", "download"),
+    ("[ExtractAudio]", "extract"),
+    ("[Metadata]", "metadata"),
+    ("[EmbedThumbnail]", "embed_thumbnail"),
+    ("[ThumbnailsConvertor]", "thumbnail"),
+    ("[info] Downloading video thumbnail", "thumbnail"),
+    ("[info] Writing video thumbnail", "thumbnail"),
+    ("[youtube]", "info"),
+    ("[info]", "info"),
+)
+
+# Final summary line only, e.g. "[download] 100% of    3.45MiB in 00:00:01 at 2.89MiB/s"
+_SIZE_RE = re.compile(r"\[download\]\s+100(?:\.0)?% of\s+~?\s*(?P<num>[0-9.]+)\s*(?P<unit>[KMG]i?B|B)\s+in\s")
+_UNITS = {"B": 1, "KiB": 1024, "MiB": 1024 ** 2, "GiB": 1024 ** 3,
+          "KB": 1000, "MB": 1000 ** 2, "GB": 1000 ** 3}
+
+
+def parse_size(num: str, unit: str) -> int:
+    return int(float(num) * _UNITS.get(unit, 1))
+
+
+class StageTimer:
+    def __init__(self, video_id: str):
+        self.video_id = video_id
+        self.started = time.monotonic()
+        self.stage = "spawn"
+        self.stage_started = self.started
+        self.stages: dict[str, float] = {}
+        self.bytes = 0
+        self.path = None  # core.REMUX / core.TRANSCODE once the stream is known
+
+    def feed(self, line: str):
+        m = _SIZE_RE.search(line)
+        if m:
+            self.bytes += parse_size(m.group("num"), m.group("unit"))
+        for prefix, stage in STAGE_PREFIXES:
+            if line.startswith(prefix):
+                self.enter(stage)
+                return
+
+    def enter(self, stage: str):
+        if stage == self.stage:
+            return
+        now = time.monotonic()
+        self.stages[self.stage] = self.stages.get(self.stage, 0.0) + now - self.stage_started
+        self.stage, self.stage_started = stage, now
+
+    def finish(self, ok: bool) -> dict:
+        self.enter("end")
+        return {
+            "id": self.video_id,
+            "ok": ok,
+            "ts": round(time.time(), 3),
+            "total_s": round(time.monotonic() - self.started, 3),
+            "bytes": self.bytes,
+            "path": self.path,
+            "stages": {k: round(v, 3) for k, v in self.stages.items()},
+        }
+
+
+class Metrics:
+    def __init__(self, log_path: Path | None = None, prometheus_path: Path | None = None):
+        self.log_path = Path(log_path) if log_path else None
+        self.prometheus_path = Path(prometheus_path) if prometheus_path else None
+        self._lock = threading.Lock()
+        self._seen: set[str] = set()
+        self._first_start = None
+        self._last_end = None
+        self._server = None
+        self.counters = {
+            "downloads_ok": 0,
+            "downloads_failed": 0,
+            "retries": 0,
+            "bytes": 0,
+            "remux": 0,
+            "transcode": 0,
+        }
+        self.stage_seconds: dict[str, float] = {}
+
+    def record(self, rec: dict):
+        """Add one finished yt-dlp run (a StageTimer record)."""
+        with self._lock:
+            c = self.counters
+            c["downloads_ok" if rec["ok"] else "downloads_failed"] += 1
+            if rec["id"] in self._seen:
+                c["retries"] += 1
+            self._seen.add(rec["id"])
+            c["bytes"] += rec["bytes"]
+            if rec["ok"] and rec.get("path") in ("remux", "transcode"):
+                c[rec["path"]] += 1
+            for stage, secs in rec["stages"].items():
+                self.stage_seconds[stage] = self.stage_seconds.get(stage, 0.0) + secs
+            end = rec["ts"]
+            start = end - rec["total_s"]
+            self._first_start = start if self._first_start is None else min(self._first_start, start)
+            self._last_end = end if self._last_end is None else max(self._last_end, end)
+
+            if self.log_path is not None:
+                self.log_path.parent.mkdir(parents=True, exist_ok=True)
+                with open(self.log_path, "a", encoding="utf-8") as fh:
+                    fh.write(json.dumps(rec) + "\n")
+            if self.prometheus_path is not None:
+                self._write_prometheus()
+
+    def throughput(self) -> float:
+        """Bytes per second over the wall-clock span of all recorded runs."""
+        if self._first_start is None or self._last_end <= self._first_start:
+            return 0.0
+        return self.counters["bytes"] / (self._last_end - self._first_start)
+
+    def summary(self) -> dict:
+        with self._lock:
+            return {
+                **self.counters,
+                "throughput_bytes_per_s": round(self.throughput(), 1),
+                "stage_seconds": {k: round(v, 3) for k, v in self.stage_seconds.items()},
+            }
+
+    def prometheus_text(self) -> str:
+        c = self.counters
+        lines = [
+            "# TYPE audiodl_downloads_total counter",
+            f'audiodl_downloads_total{{result="ok"}} {c["downloads_ok"]}',
+            f'audiodl_downloads_total{{result="failed"}} {c["downloads_failed"]}',
+            "# TYPE audiodl_retries_total counter",
+            f"audiodl_retries_total {c['retries']}",
+            "# TYPE audiodl_download_bytes_total counter",
+            f"audiodl_download_bytes_total {c['bytes']}",
+            "# TYPE audiodl_throughput_bytes_per_second gauge",
+            f"audiodl_throughput_bytes_per_second {self.throughput():.1f}",
+            "# TYPE audiodl_conversions_total counter",
+            f'audiodl_conversions_total{{path="remux"}} {c["remux"]}',
+            f'audiodl_conversions_total{{path="transcode"}} {c["transcode"]}',
+            "# TYPE audiodl_stage_seconds_total counter",
+        ]
+        for stage, secs in sorted(self.stage_seconds.items()):
+            lines.append(f'audiodl_stage_seconds_total{{stage="{stage}"}} {secs:.3f}')
+        return "\n".join(lines) + "\n"
+
+    def _write_prometheus(self):
+        self.prometheus_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.prometheus_path.with_name(self.prometheus_path.name + ".tmp")
+        tmp.write_text(self.prometheus_text(), encoding="utf-8")
+        os.replace(tmp, self.prometheus_path)
+
+    def serve(self, port: int, host: str = "127.0.0.1"):
+        """Serve the Prometheus text on http://host:port/metrics in a daemon thread."""
+        metrics = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.rstrip("/") not in ("", "/metrics"):
+                    self.send_error(404)
+                    return
+                with metrics._lock:
+                    body = metrics.prometheus_text().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self._server = ThreadingHTTPServer((host, port), Handler)
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+
+    def close(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server = None
@@ -0,0 +1,148 @@
+"""
+On-disk cache of flat playlist listings.
+
+Each playlist is stored as one JSON file named after its playlist ID with the
+entries list (the compact `Entry` fields only) and the time it was fetched.
+Files are evicted least recently used first once the cache holds more than
+`max_playlists` files or more than `max_bytes` on disk.
+"""
+
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+from pathlib import Path
+from urllib.parse import parse_qs, urlparse
+
+from audiodl.entries import Entry
+
+DEFAULT_TTL           = 6 * 3600
+DEFAULT_MAX_PLAYLISTS = 50
+DEFAULT_MAX_BYTES     = 200 * 1024 * 1024
+
+_BARE_ID = re.compile(r"^[A-Za-z0-9_-]{10,}$")
+
+
+def playlist_key(url: str) -> str:
+    """Return a stable cache key for a playlist URL or bare playlist ID."""
+    url = url.strip()
+    if _BARE_ID.match(url):
+        return url
+    parsed = urlparse(url)
+    list_id = parse_qs(parsed.query).get("list")
+    if list_id and _BARE_ID.match(list_id[0]):
+        return list_id[0]
+    return hashlib.sha1(url.encode("utf-8")).hexdigest()
+
+
+def merge_entries(old: list[Entry], new: list[Entry]) -> tuple[list[Entry], list[Entry], list[str]]:
+    """
+    Merge a fresh listing into a cached one.
+
+    Returns (merged, added, removed_ids). `merged` follows the order of `new`
+    but reuses the cached entries for those that did not change identity.
+    """
+    old_by_id = {e.id: e for e in old}
+    new_ids = {e.id for e in new}
+    merged, added = [], []
+    for e in new:
+        vid = e.id
+        if vid in old_by_id:
+            merged.append(old_by_id[vid])
+        else:
+            merged.append(e)
+            added.append(e)
+    removed = [vid for vid in old_by_id if vid not in new_ids]
+    return merged, added, removed
+
+
+def source_label(url: str, entries: list[Entry]) -> str:
+    """Short name of a playlist for the sources column."""
+    for e in entries[:1]:
+        if e.playlist:
+            return e.playlist
+    return playlist_key(url)
+
+
+def merge_playlists(playlists: list[tuple[str, list[Entry]]]) -> list[Entry]:
+    """
+    Merge several (label, entries) listings into one, deduplicated by ID.
+
+    Entries keep the order of their first appearance and get a `sources`
+    list naming every listing that contains them.
+    """
+    merged: dict[str, Entry] = {}
+    for label, entries in playlists:
+        for e in entries:
+            vid = e.id
+            if vid is None:
+                continue
+            if vid in merged:
+                if label not in merged[vid].sources:
+                    merged[vid].sources.append(label)
+            else:
+                merged[vid] = e.with_sources([label])
+    return list(merged.values())
+
+
+class PlaylistCache:
+    def __init__(self, cache_dir: Path, ttl: float = DEFAULT_TTL,
+                 max_playlists: int = DEFAULT_MAX_PLAYLISTS, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.cache_dir = Path(cache_dir)
+        self.ttl = ttl
+        self.max_playlists = max_playlists
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+
+    def _path(self, key: str) -> Path:
+        return self.cache_dir / f"{key}.json"
+
+    def get(self, key: str) -> tuple[list[Entry], float] | None:
+        """Return (entries, fetched_at) or None when nothing usable is cached."""
+        path = self._path(key)
+        with self._lock:
+            try:
+                data = json.loads(path.read_text(encoding="utf-8"))
+                os.utime(path)  # mark as recently used for eviction
+            except (OSError, ValueError):
+                return None
+        if not isinstance(data.get("entries"), list):
+            return None
+        entries = [Entry.from_info(e) for e in data["entries"] if isinstance(e, dict)]
+        return entries, float(data.get("fetched_at", 0))
+
+    def is_fresh(self, fetched_at: float) -> bool:
+        return time.time() - fetched_at < self.ttl
+
+    def put(self, key: str, entries: list[Entry]):
+        path = self._path(key)
+        tmp = path.with_suffix(".tmp")
+        payload = json.dumps({"fetched_at": time.time(), "entries": [e.to_dict() for e in entries]})
+        with self._lock:
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+            tmp.write_text(payload, encoding="utf-8")
+            os.replace(tmp, path)
+            self._evict()
+
+    def clear(self):
+        with self._lock:
+            if self.cache_dir.exists():
+                for f in self.cache_dir.glob("*.json"):
+                    f.unlink(missing_ok=True)
+
+    def _evict(self):
+        files = []
+        for f in self.cache_dir.glob("*.json"):
+            try:
+                st = f.stat()
+            except OSError:
+                continue
+            files.append((st.st_mtime, st.st_size, f))
+        files.sort(reverse=True)  # most recently used first
+        total = 0
+        for i, (_, size, f) in enumerate(files):
+            total += size
+            if i >= self.max_playlists or (total > self.max_bytes and i > 0):
+                f.unlink(missing_ok=True)
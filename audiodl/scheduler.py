@@ -0,0 +1,293 @@
+"""
+Bounded worker pools for running several downloads at once.
+
+Every video ID becomes a `DownloadJob` that moves through the states below.
+State changes are reported through the app queue as ("state", vid, state)
+and the outcome of every job that ran to the end as ("done", vid, ok), so
+the GUI keeps reading plain tuple messages like it always has.
+
+With a `convert_fn` the work is split in two stages: network workers fetch
+the media and hand it over through a bounded queue to a CPU-sized pool
+that converts it. A full hand-off queue blocks the network workers, so
+downloads never run far ahead of what the converters can take.
+
+With a `batch_fn` each network worker takes up to `batch_size` queued jobs
+at once and runs them through one call (one yt-dlp process). Jobs that fail
+inside a batch fall back to `download_fn` one by one for their retries.
+
+A `governor` (audiodl.throttle.NetworkGovernor) can narrow how many of the
+network workers may run at once; each one holds a slot for as long as its
+yt-dlp process is running.
+
+A `reuse_fn(video_id)` returning True marks a job done without running
+anything, e.g. because the file could be taken from the library.
+"""
+
+import os
+import queue
+import threading
+
+QUEUED         = "queued"
+DOWNLOADING    = "downloading"
+DOWNLOADED     = "downloaded"     # waiting for a conversion slot
+POSTPROCESSING = "post-processing"
+DONE           = "done"
+FAILED         = "failed"
+CANCELLED      = "cancelled"
+
+FINAL_STATES = (DONE, FAILED, CANCELLED)
+
+
+class DownloadJob:
+    __slots__ = ("video_id", "state", "attempts", "result")
+
+    def __init__(self, video_id: str):
+        self.video_id = video_id
+        self.state = QUEUED
+        self.attempts = 0
+        self.result = None
+
+
+class DownloadScheduler:
+    """
+    Run `download_fn` over a list of IDs with at most `workers` in flight.
+
+    `download_fn(video_id, on_state, cancel)` must return True on success.
+    It may call `on_state(POSTPROCESSING)` when conversion starts and should
+    stop early once the `cancel` event is set. `on_change(video_id, state)`,
+    if given, is called from the worker threads on every state change.
+
+    If `convert_fn(video_id, result, on_state, cancel)` is given, whatever
+    truthy value `download_fn` returned is passed on to it in one of
+    `cpu_workers` conversion threads, and its return value decides success.
+    A plain True means the job needs no conversion and is finished at once.
+
+    If `batch_fn(video_ids, on_state, on_done, cancel)` is given, it handles
+    first attempts in chunks. It calls `on_state(video_id, state)` as each
+    video starts and `on_done(video_id, result)` for every success, as soon
+    as it happens; videos it never reports as done count as failed attempts.
+
+    With a `governor`, `workers` is the ceiling and the governor decides how
+    many of them are downloading at any moment.
+    """
+
+    def __init__(self, download_fn, q: queue.Queue, workers: int = 3,
+                 retries: int = 2, retry_delay: float = 2.0, on_change=None,
+                 convert_fn=None, cpu_workers: int | None = None, handoff_size: int | None = None,
+                 batch_fn=None, batch_size: int = 1, governor=None, reuse_fn=None):
+        self.download_fn = download_fn
+        self.convert_fn = convert_fn
+        self.batch_fn = batch_fn
+        self.batch_size = max(1, int(batch_size))
+        self.governor = governor
+        self.reuse_fn = reuse_fn
+        self.on_change = on_change
+        self.cpu_workers = max(1, int(cpu_workers or os.cpu_count() or 1))
+        self._handoff: queue.Queue = queue.Queue(maxsize=handoff_size or self.cpu_workers * 2)
+        self.queue = q
+        self.workers = max(1, int(workers))
+        self.retries = max(0, int(retries))
+        self.retry_delay = retry_delay
+        self.jobs: dict[str, DownloadJob] = {}
+        self._pending: queue.Queue = queue.Queue()
+        self._cancel = threading.Event()
+        self._lock = threading.Lock()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancel.is_set()
+
+    def cancel(self):
+        self._cancel.set()
+
+    def counts(self) -> dict[str, int]:
+        with self._lock:
+            out = {}
+            for job in self.jobs.values():
+                out[job.state] = out.get(job.state, 0) + 1
+            return out
+
+    def run(self, ids: list[str]) -> dict[str, int]:
+        """Download every ID and block until all jobs reached a final state."""
+        for vid in dict.fromkeys(ids):  # keep order, drop duplicates
+            job = DownloadJob(vid)
+            self.jobs[vid] = job
+            self._pending.put(job)
+            self.queue.put(("state", vid, QUEUED))
+
+        threads = [
+            threading.Thread(target=self._worker, daemon=True)
+            for _ in range(min(self.workers, len(self.jobs)))
+        ]
+        converters = []
+        if self.convert_fn is not None:
+            converters = [
+                threading.Thread(target=self._convert_worker, daemon=True)
+                for _ in range(min(self.cpu_workers, len(self.jobs)))
+            ]
+        if self.governor is not None:
+            self.governor.start()
+        for t in threads + converters:
+            t.start()
+        for t in threads:
+            t.join()
+        if self.governor is not None:
+            self.governor.stop()
+        for _ in converters:
+            self._handoff.put(None)
+        for t in converters:
+            t.join()
+        return self.counts()
+
+    # ---------------- INTERNALS ----------------
+    def _set_state(self, job: DownloadJob, state: str):
+        with self._lock:
+            if job.state == state:
+                return
+            job.state = state
+        self.queue.put(("state", job.video_id, state))
+        if self.on_change is not None:
+            self.on_change(job.video_id, state)
+
+    def _worker(self):
+        while True:
+            if self.governor is not None:
+                self.governor.acquire(self._cancel)
+            try:
+                jobs = self._take()
+                if not jobs:
+                    return
+                if self.reuse_fn is not None and not self._cancel.is_set():
+                    jobs = [job for job in jobs if not self._reuse(job)]
+                if not jobs:
+                    continue
+                if self._cancel.is_set():
+                    for job in jobs:
+                        self._set_state(job, CANCELLED)
+                elif len(jobs) > 1:
+                    self._run_batch(jobs)
+                else:
+                    self._run_job(jobs[0])
+            finally:
+                if self.governor is not None:
+                    self.governor.release()
+
+    def _take(self) -> list[DownloadJob]:
+        size = 1
+        if self.batch_fn is not None:
+            # Spread what is left over all workers rather than letting the
+            # first one take everything.
+            slots = self.governor.limit if self.governor is not None else self.workers
+            size = min(self.batch_size, max(1, -(-self._pending.qsize() // slots)))
+        jobs = []
+        try:
+            while len(jobs) < size:
+                jobs.append(self._pending.get_nowait())
+        except queue.Empty:
+            pass
+        return jobs
+
+    def _reuse(self, job: DownloadJob) -> bool:
+        try:
+            reused = bool(self.reuse_fn(job.video_id))
+        except Exception as e:
+            self.queue.put(("warning", f"{job.video_id}: {e}"))
+            reused = False
+        if reused:
+            self._finish(job, True)
+        return reused
+
+    def _run_batch(self, jobs: list[DownloadJob]):
+        done = set()
+
+        def on_done(vid: str, result):
+            done.add(vid)
+            self.jobs[vid].result = result
+            self._complete(self.jobs[vid], True)
+
+        for job in jobs:
+            job.attempts += 1
+        try:
+            self.batch_fn(
+                [job.video_id for job in jobs],
+                lambda vid, s: self._set_state(self.jobs[vid], s),
+                on_done, self._cancel,
+            )
+        except Exception as e:
+            self.queue.put(("warning", f"batch of {len(jobs)}: {e}"))
+        for job in jobs:
+            if job.video_id in done:
+                continue
+            if self._cancel.is_set():
+                self._complete(job, False)
+            else:
+                self._run_job(job)
+
+    def _run_job(self, job: DownloadJob):
+        ok = False
+        while not ok and job.attempts <= self.retries:
+            if job.attempts:
+                self._set_state(job, QUEUED)
+                # Linear backoff; wakes up immediately on cancel.
+                if self._cancel.wait(self.retry_delay * job.attempts):
+                    break
+            job.attempts += 1
+            self._set_state(job, DOWNLOADING)
+            try:
+                job.result = self.download_fn(
+                    job.video_id, lambda s, j=job: self._set_state(j, s), self._cancel,
+                )
+                ok = bool(job.result)
+            except Exception as e:
+                self.queue.put(("warning", f"{job.video_id}: {e}"))
+                ok = False
+            if self._cancel.is_set():
+                break
+        self._complete(job, ok)
+
+    def _complete(self, job: DownloadJob, ok: bool):
+        if not ok and self._cancel.is_set():
+            self._set_state(job, CANCELLED)
+            return
+        if ok and self.convert_fn is not None and job.result is not True:
+            self._set_state(job, DOWNLOADED)
+            self._hand_off(job)
+            return
+        self._finish(job, ok)
+
+    def _finish(self, job: DownloadJob, ok: bool):
+        self._set_state(job, DONE if ok else FAILED)
+        self.queue.put(("done", job.video_id, ok))
+
+    def _hand_off(self, job: DownloadJob):
+        # Blocks while the converters are busy; that is the backpressure.
+        while True:
+            try:
+                self._handoff.put(job, timeout=0.2)
+                return
+            except queue.Full:
+                if self._cancel.is_set():
+                    self._set_state(job, CANCELLED)
+                    return
+
+    def _convert_worker(self):
+        while True:
+            job = self._handoff.get()
+            if job is None:
+                return
+            if self._cancel.is_set():
+                self._set_state(job, CANCELLED)
+                continue
+            self._set_state(job, POSTPROCESSING)
+            try:
+                ok = bool(self.convert_fn(
+                    job.video_id, job.result, lambda s, j=job: self._set_state(j, s), self._cancel,
+                ))
+            except Exception as e:
+                self.queue.put(("warning", f"{job.video_id}: {e}"))
+                ok = False
+            job.result = None
+            if not ok and self._cancel.is_set():
+                self._set_state(job, CANCELLED)
+            else:
+                self._finish(job, ok)
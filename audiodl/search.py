@@ -0,0 +1,145 @@
+"""
+Precomputed search index over playlist entries.
+
+Titles and uploaders are normalized once (accents stripped, casefolded,
+whitespace collapsed) so a query is a handful of substring checks per entry.
+
+Query syntax:
+  word "some phrase"   every term must appear in the title or uploader
+  -word                term must not appear
+  uploader:name        uploader/channel contains name (also `by:`)
+  dur:>3:00 dur:<600   duration bounds, in seconds or [h:]mm:ss
+  dur:2:00-5:00        duration range
+"""
+
+import re
+import unicodedata
+
+from audiodl.entries import Entry
+
+_TOKEN_RE = re.compile(r'(-?)(?:(\w+):)?(?:"([^"]*)"|(\S+))')
+
+
+def normalize(text: str | None) -> str:
+    if not text:
+        return ""
+    text = unicodedata.normalize("NFKD", text)
+    text = "".join(ch for ch in text if not unicodedata.combining(ch))
+    return " ".join(text.casefold().split())
+
+
+def parse_duration(text: str) -> int | None:
+    """Parse '90', '1:30' or '1:02:03' into seconds."""
+    try:
+        secs = 0
+        for part in text.split(":"):
+            secs = secs * 60 + int(part)
+        return secs
+    except ValueError:
+        return None
+
+
+class Query:
+    __slots__ = ("include", "exclude", "uploader", "min_dur", "max_dur")
+
+    def __init__(self):
+        self.include: list[str] = []
+        self.exclude: list[str] = []
+        self.uploader: list[str] = []
+        self.min_dur = None
+        self.max_dur = None
+
+    @property
+    def plain(self) -> bool:
+        """True when the query only has positive text terms."""
+        return not (self.exclude or self.uploader or self.min_dur is not None or self.max_dur is not None)
+
+
+def parse_query(text: str) -> Query:
+    q = Query()
+    for neg, field, quoted, word in _TOKEN_RE.findall(text):
+        value = quoted if quoted else word
+        field = field.lower()
+        if field in ("uploader", "by", "channel"):
+            if value:
+                q.uploader.append(normalize(value))
+            continue
+        if field in ("dur", "duration"):
+            if value.startswith(">"):
+                q.min_dur = parse_duration(value[1:])
+            elif value.startswith("<"):
+                q.max_dur = parse_duration(value[1:])
+            elif "-" in value:
+                lo, _, hi = value.partition("-")
+                q.min_dur, q.max_dur = parse_duration(lo), parse_duration(hi)
+            continue
+        if field:
+            # Unknown field: search for the text as typed.
+            value = f"{field}:{value}"
+        value = normalize(value)
+        if value:
+            (q.exclude if neg else q.include).append(value)
+    return q
+
+
+class SearchIndex:
+    def __init__(self, entries: list[Entry]):
+        self.titles: list[str] = []
+        self.uploaders: list[str] = []
+        self.durations: list = []
+        self.extend(entries)
+
+    def extend(self, entries: list[Entry]):
+        """Index more entries; they get the indices following the existing ones."""
+        self.titles.extend(normalize(e.title) for e in entries)
+        self.uploaders.extend(normalize(e.uploader) for e in entries)
+        self.durations.extend(e.duration for e in entries)
+        self._last_text = None
+        self._last_rows = None
+
+    def __len__(self) -> int:
+        return len(self.titles)
+
+    def search(self, text: str) -> list[int]:
+        """Return the indices of matching entries, in playlist order."""
+        norm = normalize(text)
+        if not norm:
+            rows = list(range(len(self.titles)))
+            self._last_text, self._last_rows = norm, rows
+            return rows
+
+        q = parse_query(text)
+        # Typing more characters of a plain query can only narrow the result,
+        # except while a quoted phrase is still open: a partial `"love` is
+        # searched as a literal quote and matches nothing.
+        candidates = range(len(self.titles))
+        last = self._last_text
+        if (last and q.plain and norm.startswith(last) and parse_query(last).plain
+                and last.count('"') % 2 == 0 and norm.count('"') % 2 == 0):
+            candidates = self._last_rows
+
+        rows = [i for i in candidates if self._match(i, q)]
+        self._last_text, self._last_rows = norm, rows
+        return rows
+
+    def _match(self, i: int, q: Query) -> bool:
+        title = self.titles[i]
+        uploader = self.uploaders[i]
+        for term in q.include:
+            if term not in title and term not in uploader:
+                return False
+        for term in q.exclude:
+            if term in title or term in uploader:
+                return False
+        for term in q.uploader:
+            if term not in uploader:
+                return False
+        if q.min_dur is not None or q.max_dur is not None:
+            dur = self.durations[i]
+            if dur is None:
+                return False
+            if q.min_dur is not None and dur < q.min_dur:
+                return False
+            if q.max_dur is not None and dur > q.max_dur:
+                return False
+        return True
@@ -0,0 +1,200 @@
+"""
+Shared control over how hard the download workers hit the network.
+
+`NetworkGovernor` does three things for every worker of a scheduler:
+
+  * splits a global bandwidth cap between the download slots by giving each
+    new yt-dlp process `--limit-rate cap/slots`. A running process keeps
+    the share it started with, so after slots were added the total can run
+    above the cap until the older processes finish: the cap is approximate;
+  * hands out download slots, raising the number of slots by one while the
+    aggregate speed keeps improving (additive increase);
+  * on HTTP 429/403 or a stalled download halves the slots and pauses new
+    downloads for an exponentially growing, jittered delay
+    (multiplicative decrease).
+
+Its state is reported through the app queue as ("network", state_dict).
+"""
+
+import queue
+import random
+import re
+import threading
+import time
+
+from audiodl.metrics import parse_size
+
+_SPEED_RE    = re.compile(r"(?P<num>[0-9.]+)\s*(?P<unit>[KMG]i?B|B)/s")
+_RATE_RE     = re.compile(r"^\s*(?P<num>[0-9.]+)\s*(?P<unit>[kKmMgG]?)(?:i?B)?(?:/s)?\s*$")
+_THROTTLE_RE = re.compile(r"HTTP Error (?P<code>429|403)")
+
+_RATE_UNITS = {"": 1, "k": 1024, "m": 1024 ** 2, "g": 1024 ** 3}
+
+
+def parse_rate(text: str | None) -> int | None:
+    """'4.2M' / '500K' / '1000000' -> bytes per second (None if empty)."""
+    if not text:
+        return None
+    m = _RATE_RE.match(str(text))
+    if not m:
+        raise ValueError(f"Invalid rate: {text!r}")
+    return int(float(m.group("num")) * _RATE_UNITS[m.group("unit").lower()])
+
+
+def fmt_rate(bps: float) -> str:
+    for unit, size in (("GiB", 1024 ** 3), ("MiB", 1024 ** 2), ("KiB", 1024)):
+        if bps >= size:
+            return f"{bps / size:.1f}{unit}/s"
+    return f"{bps:.0f}B/s"
+
+
+def describe(state: dict) -> str:
+    """One-line summary of a ("network", state) message for the status bar."""
+    text = f"{state['active']}/{state['limit']} slots • {fmt_rate(state['throughput_bytes_per_s'])}"
+    if state["rate_limit"]:
+        text += f" (cap {fmt_rate(state['rate_limit'])})"
+    return f"{text} • {state['state']}"
+
+
+class NetworkGovernor:
+    def __init__(self, max_workers: int, q: queue.Queue | None = None, rate_limit: int | None = None,
+                 adaptive: bool = True, start_workers: int | None = None, min_workers: int = 1,
+                 interval: float = 5.0, stall_after: float = 30.0,
+                 backoff_base: float = 2.0, backoff_max: float = 120.0):
+        self.max_workers = max(1, int(max_workers))
+        self.min_workers = max(1, min(int(min_workers), self.max_workers))
+        self.limit = self.max_workers
+        if adaptive:
+            self.limit = max(self.min_workers, min(self.max_workers, start_workers or (self.max_workers + 1) // 2))
+        self.queue = q
+        self.rate_limit = rate_limit
+        self.adaptive = adaptive
+        self.interval = interval
+        self.stall_after = stall_after
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.active = 0
+        self.state = "steady"
+        self.throughput = 0.0
+        self._best = 0.0
+        self._strikes = 0
+        self._paused_until = 0.0
+        self._speeds: dict[str, float] = {}
+        self._last_progress: dict[str, float] = {}
+        self._cond = threading.Condition()
+        self._stop = threading.Event()
+        self._thread = None
+
+    # ---------------- SLOTS ----------------
+    def acquire(self, cancel: threading.Event | None = None):
+        """Block until a slot is free and no backoff is running (or cancel)."""
+        with self._cond:
+            while not (cancel is not None and cancel.is_set()):
+                wait = self._paused_until - time.monotonic()
+                if wait <= 0 and self.active < self.limit:
+                    break
+                self._cond.wait(min(0.5, wait) if wait > 0 else 0.5)
+            self.active += 1
+
+    def release(self):
+        with self._cond:
+            self.active -= 1
+            self._cond.notify_all()
+
+    def rate_args(self) -> list[str]:
+        """yt-dlp arguments for a process started now (fixed for its lifetime)."""
+        if not self.rate_limit:
+            return []
+        with self._cond:
+            # Split by slots, not by the processes running right now, or the
+            # first ones to start would each take the whole cap.
+            share = self.rate_limit // max(1, self.limit, self.active)
+        return ["--limit-rate", str(max(1024, share))]
+
+    # ---------------- OBSERVATIONS ----------------
+    def observe(self, video_id: str, speed: str):
+        """Record the speed string of a [download] progress line."""
+        m = _SPEED_RE.search(speed)
+        with self._cond:
+            self._speeds[video_id] = parse_size(m.group("num"), m.group("unit")) if m else 0.0
+            self._last_progress[video_id] = time.monotonic()
+
+    def check_line(self, line: str):
+        m = _THROTTLE_RE.search(line)
+        if m:
+            self.throttled(f"HTTP {m.group('code')}")
+
+    def finished(self, video_id: str):
+        """Stop watching a video, once its transfer is complete or it ended."""
+        with self._cond:
+            self._speeds.pop(video_id, None)
+            self._last_progress.pop(video_id, None)
+
+    def throttled(self, reason: str):
+        with self._cond:
+            self._strikes += 1
+            delay = min(self.backoff_max, self.backoff_base * 2 ** (self._strikes - 1))
+            delay *= random.uniform(0.5, 1.5)
+            self._paused_until = max(self._paused_until, time.monotonic() + delay)
+            if self.adaptive:
+                self.limit = max(self.min_workers, self.limit // 2)
+            self._best = 0.0
+            self.state = f"backoff {delay:.0f}s ({reason})"
+        self._report()
+
+    # ---------------- CONTROL LOOP ----------------
+    def start(self):
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._loop, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _loop(self):
+        while not self._stop.wait(self.interval):
+            self.evaluate()
+
+    def evaluate(self):
+        now = time.monotonic()
+        with self._cond:
+            stalled = [vid for vid, t in self._last_progress.items() if now - t > self.stall_after]
+            for vid in stalled:
+                self._last_progress[vid] = now  # one strike per stall period
+        if stalled:
+            self.throttled("stalled")
+            return
+        with self._cond:
+            self.throughput = sum(self._speeds.values())
+            if now >= self._paused_until:
+                if self.adaptive and self.throughput > self._best * 1.05:
+                    # Still getting faster: try one more slot if all are busy.
+                    self._best = self.throughput
+                    if self.active >= self.limit and self.limit < self.max_workers:
+                        self.limit += 1
+                        self._cond.notify_all()
+                    self._strikes = 0
+                else:
+                    # Let the reference decay so a lasting plateau can be
+                    # probed again later.
+                    self._best = max(self.throughput, self._best * 0.95)
+                self.state = "ramping up" if self.adaptive and self.limit < self.max_workers else "steady"
+        self._report()
+
+    def snapshot(self) -> dict:
+        with self._cond:
+            return {
+                "state": self.state,
+                "active": self.active,
+                "limit": self.limit,
+                "max": self.max_workers,
+                "throughput_bytes_per_s": round(self.throughput),
+                "rate_limit": self.rate_limit,
+            }
+
+    def _report(self):
+        if self.queue is not None:
+            self.queue.put(("network", self.snapshot()))
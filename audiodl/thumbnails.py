@@ -0,0 +1,129 @@
+"""
+Local cache of video thumbnails, shared by every download and the list view.
+
+yt-dlp is told to keep the thumbnail it embeds in the cache directory, named
+after the video ID. The next time the same video is downloaded (a re-run,
+another format, another playlist) yt-dlp finds the file already there and
+skips fetching it. Passing --write-thumbnail along with --embed-thumbnail
+also stops the embed step from deleting the file afterwards.
+
+Previews for the list view are small PNGs, which Tk shows without Pillow.
+They are converted once from the cached thumbnail, or from YouTube's
+medium-size image when there is none yet, and stored as <id>.preview.png.
+
+Files are evicted least recently used first once the cache holds more than
+`max_bytes` on disk.
+"""
+
+import os
+import shutil
+import subprocess
+import tempfile
+import threading
+import urllib.request
+from pathlib import Path
+
+DEFAULT_MAX_BYTES = 300 * 1024 * 1024
+PREVIEW_WIDTH     = 160
+PREVIEW_SUFFIX    = ".preview.png"
+PREVIEW_URL       = "https://i.ytimg.com/vi/{id}/mqdefault.jpg"
+
+
+class ThumbnailCache:
+    def __init__(self, cache_dir: Path, max_bytes: int = DEFAULT_MAX_BYTES, ffmpeg: Path | None = None):
+        self.cache_dir = Path(cache_dir)
+        self.max_bytes = max_bytes
+        self.ffmpeg = ffmpeg
+        self._lock = threading.Lock()
+
+    def ytdlp_args(self, embed: bool) -> list[str]:
+        """Arguments that make yt-dlp write thumbnails to (and reuse them from) the cache."""
+        args = ["--write-thumbnail"]
+        if embed:
+            args.append("--embed-thumbnail")
+        return args + [
+            "-P", f"thumbnail:{self.cache_dir}",
+            "-o", "thumbnail:%(id)s.%(ext)s",
+        ]
+
+    def _files(self, video_id: str) -> list[Path]:
+        return [f for f in self.cache_dir.glob(f"{video_id}.*")
+                if f.stem.split(".")[0] == video_id and f.suffix != ".part"]
+
+    def lookup(self, video_id: str) -> Path | None:
+        """The full-size thumbnail yt-dlp left for this video, if any."""
+        for f in self._files(video_id):
+            if not f.name.endswith(PREVIEW_SUFFIX):
+                return f
+        return None
+
+    def touch(self, video_id: str):
+        """Mark a video's files as recently used."""
+        for f in self._files(video_id):
+            try:
+                os.utime(f)
+            except OSError:
+                pass
+
+    def preview(self, video_id: str, width: int = PREVIEW_WIDTH) -> Path | None:
+        """
+        Path of a PNG preview for the video, creating it if needed.
+
+        Blocks on ffmpeg and, without a cached thumbnail, on the network, so
+        call it off the UI thread. Returns None if no preview can be made.
+        """
+        dest = self.cache_dir / f"{video_id}{PREVIEW_SUFFIX}"
+        if dest.exists():
+            self.touch(video_id)
+            return dest
+        if self.ffmpeg is None:
+            return None
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        src = self.lookup(video_id)
+        tmp_dir = tempfile.mkdtemp(dir=self.cache_dir)
+        try:
+            if src is None:
+                src = Path(tmp_dir) / "src.jpg"
+                try:
+                    with urllib.request.urlopen(PREVIEW_URL.format(id=video_id), timeout=10) as resp, \
+                            open(src, "wb") as fh:
+                        shutil.copyfileobj(resp, fh)
+                except OSError:
+                    return None
+            tmp = Path(tmp_dir) / "preview.png"
+            try:
+                proc = subprocess.run(
+                    [str(self.ffmpeg), "-v", "error", "-y", "-i", str(src),
+                     "-vf", f"scale={width}:-2", "-frames:v", "1", str(tmp)],
+                    capture_output=True,
+                )
+            except OSError:
+                return None
+            if proc.returncode != 0 or not tmp.exists():
+                return None
+            os.replace(tmp, dest)
+        finally:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+        return dest
+
+    def clear(self):
+        with self._lock:
+            shutil.rmtree(self.cache_dir, ignore_errors=True)
+
+    def evict(self):
+        """Delete least recently used files until the cache fits `max_bytes`."""
+        with self._lock:
+            files = []
+            for f in self.cache_dir.glob("*.*"):
+                try:
+                    st = f.stat()
+                except OSError:
+                    continue
+                if f.is_file():
+                    files.append((st.st_mtime, st.st_size, f))
+            files.sort(reverse=True)  # most recently used first
+            total = 0
+            for _, size, f in files:
+                total += size
+                if total > self.max_bytes:
+                    f.unlink(missing_ok=True)
@@ -0,0 +1,287 @@
+"""
+Offline benchmark suite for AudioDL.
+
+  python benchmarks/run_benchmarks.py [--quick] [--suites fetch,gui,poll,download] [-o results.json]
+
+yt-dlp and ffmpeg are replaced by the scripts in benchmarks/stubs, so the
+suite needs no network and no real tools. Suites:
+
+  fetch     time to first entry and total time of playlist enumeration
+  gui       entry memory, _populate_list and search filtering for 100 to 50k entries
+  poll      _poll_queue lag and queue depth under a flood of progress lines
+  download  end-to-end throughput at several concurrencies, single-process
+            and pipelined (separate conversion pool)
+
+The gui and poll suites need a display (use xvfb-run on CI) and are
+reported as skipped without one. Results are written as JSON so runs can be
+compared between releases.
+"""
+
+import argparse
+import json
+import os
+import platform
+import queue
+import resource
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+STUBS = Path(__file__).resolve().parent / "stubs"
+sys.path.insert(0, str(ROOT))
+sys.path.insert(0, str(STUBS))
+
+from audiodl import core  # noqa: E402
+from audiodl.entries import Entry  # noqa: E402
+from fake_ytdlp import fake_entry  # noqa: E402
+
+FULL_SIZES  = [100, 1000, 10000, 50000]
+QUICK_SIZES = [100, 1000, 5000]
+
+
+def peak_rss_kb() -> dict:
+    # ru_maxrss is in KiB on Linux.
+    return {
+        "self": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+        "children": resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss,
+    }
+
+
+def install_stubs(bin_dir: Path):
+    """Point AudioDL at shell wrappers around the stub scripts."""
+    for name, script in (("yt-dlp", "fake_ytdlp.py"), ("ffmpeg", "fake_ffmpeg.py")):
+        wrapper = bin_dir / name
+        wrapper.write_text(f'#!/bin/sh\nexec "{sys.executable}" "{STUBS / script}" "$@"\n')
+        wrapper.chmod(0o755)
+    core.YTDLP_EXE = bin_dir / "yt-dlp"
+    core.FFMPEG_EXE = bin_dir / "ffmpeg"
+
+
+# ------------------------------------------------------------------
+# SUITES
+# ------------------------------------------------------------------
+def bench_fetch(sizes: list[int]) -> list[dict]:
+    results = []
+    for n in sizes:
+        os.environ["FAKE_YTDLP_ENTRIES"] = str(n)
+        start = time.perf_counter()
+        first = None
+        count = 0
+        for _ in core.iter_playlist("https://www.youtube.com/playlist?list=PLbenchmark"):
+            if first is None:
+                first = time.perf_counter() - start
+            count += 1
+        results.append({
+            "entries": count,
+            "first_entry_s": round(first or 0.0, 4),
+            "total_s": round(time.perf_counter() - start, 4),
+        })
+    return results
+
+
+def make_app(tmp: Path):
+    import tkinter as tk
+    try:
+        import yt_playlist_gui as gui
+        from audiodl.journal import JobJournal
+        app = gui.App()
+    except tk.TclError as e:
+        return None, str(e)
+    app.withdraw()
+    app.journal = JobJournal(tmp / "jobs.json")  # never offer a resume dialog
+    app.out_dir_var.set(str(tmp / "out"))
+    return app, None
+
+
+def bench_gui(app, sizes: list[int]) -> list[dict]:
+    results = []
+    for n in sizes:
+        tracemalloc.start()
+        app.entries = [Entry.from_info(fake_entry(i)) for i in range(n)]
+        entries_kb = tracemalloc.get_traced_memory()[0] // 1024
+        tracemalloc.stop()
+        app.search_var.set("")
+        app.update()
+
+        start = time.perf_counter()
+        app._populate_list()
+        app.update_idletasks()
+        populate = time.perf_counter() - start
+
+        app.search_var.set("track 1")
+        start = time.perf_counter()
+        app._apply_filter()
+        app.update_idletasks()
+        filter_s = time.perf_counter() - start
+        matches = len(app.canvas.rows)
+
+        app.search_var.set("track 12 artist")
+        start = time.perf_counter()
+        app._apply_filter()
+        app.update_idletasks()
+        narrow_s = time.perf_counter() - start
+
+        results.append({
+            "entries": n,
+            "entries_kb": entries_kb,
+            "populate_s": round(populate, 4),
+            "filter_s": round(filter_s, 4),
+            "filter_matches": matches,
+            "narrow_filter_s": round(narrow_s, 4),
+        })
+    app.search_var.set("")
+    return results
+
+
+def bench_poll(app, rates: list[int], seconds: float, videos: int = 8) -> list[dict]:
+    results = []
+    for rate in rates:
+        for key in app.poll_stats:
+            app.poll_stats[key] = 0 if isinstance(app.poll_stats[key], int) else 0.0
+        while not app.queue.empty():
+            app.queue.get_nowait()
+        stop = threading.Event()
+
+        def producer():
+            interval = 1 / rate
+            i = 0
+            next_at = time.perf_counter()
+            while not stop.is_set():
+                vid = f"{i % videos:011d}"
+                app.queue.put(("progress", vid, (i // videos) % 100, "1.00MiB/s", "00:10"))
+                i += 1
+                next_at += interval
+                delay = next_at - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+
+        t = threading.Thread(target=producer, daemon=True)
+        t.start()
+        end = time.perf_counter() + seconds
+        while time.perf_counter() < end:
+            app.update()
+            time.sleep(0.001)
+        stop.set()
+        t.join()
+        produced_until = time.perf_counter()
+        while not app.queue.empty():
+            app.update()
+            time.sleep(0.001)
+        st = app.poll_stats
+        results.append({
+            "messages_per_s": rate,
+            "messages": st["messages"],
+            "coalesced": st["coalesced"],
+            "max_batch": st["max_batch"],
+            "max_queue_depth": st["max_queue_depth"],
+            "max_lag_ms": round(st["max_lag_ms"], 2),
+            "drain_after_stop_s": round(time.perf_counter() - produced_until, 4),
+        })
+    return results
+
+
+def bench_download(tmp: Path, levels: list[int], items: int) -> list[dict]:
+    results = []
+    size = float(os.environ.get("FAKE_YTDLP_SIZE_MB", 4))
+    for pipeline, workers in [(p, w) for p in (False, True) for w in levels]:
+        out = tmp / f"dl-{workers}-{'pipe' if pipeline else 'single'}"
+        out.mkdir()
+        q: queue.Queue = queue.Queue()
+        scheduler = core.build_scheduler(out, q, "aac", workers=workers, retries=0, pipeline=pipeline)
+        ids = [f"{i:011d}" for i in range(items)]
+        start = time.perf_counter()
+        counts = scheduler.run(ids)
+        elapsed = time.perf_counter() - start
+        results.append({
+            "mode": "pipeline" if pipeline else "single",
+            "concurrency": workers,
+            "items": items,
+            "done": counts.get("done", 0),
+            "elapsed_s": round(elapsed, 4),
+            "items_per_s": round(items / elapsed, 3),
+            "mib_per_s": round(items * size / elapsed, 3),
+            "queue_messages": q.qsize(),
+        })
+    return results
+
+
+# ------------------------------------------------------------------
+def main(argv: list[str] | None = None) -> int:
+    p = argparse.ArgumentParser(description="Run the AudioDL offline benchmarks.")
+    p.add_argument("--quick", action="store_true", help="smaller sizes for a fast smoke run")
+    p.add_argument("--suites", default="fetch,gui,poll,download")
+    p.add_argument("-o", "--output", help="write results JSON here (default: stdout)")
+    args = p.parse_args(argv)
+    suites = {s.strip() for s in args.suites.split(",") if s.strip()}
+    sizes = QUICK_SIZES if args.quick else FULL_SIZES
+
+    os.environ.setdefault("FAKE_YTDLP_SIZE_MB", "4")
+    os.environ.setdefault("FAKE_YTDLP_SPEED_MBPS", "8" if args.quick else "4")
+    os.environ.setdefault("FAKE_YTDLP_STARTUP_S", "0.1")
+
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT,
+                                capture_output=True, text=True).stdout.strip()
+    except OSError:
+        commit = ""
+    report = {
+        "meta": {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "commit": commit,
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+            "quick": args.quick,
+            "stub_env": {k: v for k, v in os.environ.items() if k.startswith("FAKE_")},
+        },
+        "results": {},
+        "skipped": {},
+    }
+
+    with tempfile.TemporaryDirectory(prefix="audiodl-bench-") as tmp_name:
+        tmp = Path(tmp_name)
+        bin_dir = tmp / "bin"
+        bin_dir.mkdir()
+        install_stubs(bin_dir)
+
+        if "fetch" in suites:
+            report["results"]["fetch"] = bench_fetch(sizes)
+            report["results"]["fetch_peak_rss_kb"] = peak_rss_kb()
+
+        if suites & {"gui", "poll"}:
+            app, reason = make_app(tmp)
+            if app is None:
+                for name in suites & {"gui", "poll"}:
+                    report["skipped"][name] = f"no display: {reason}"
+            else:
+                if "gui" in suites:
+                    report["results"]["gui"] = bench_gui(app, sizes)
+                    report["results"]["gui_peak_rss_kb"] = peak_rss_kb()
+                if "poll" in suites:
+                    report["results"]["poll"] = bench_poll(
+                        app, [500, 2000] if args.quick else [500, 2000, 10000],
+                        seconds=1.0 if args.quick else 3.0)
+                app.destroy()
+
+        if "download" in suites:
+            report["results"]["download"] = bench_download(
+                tmp, [1, 2, 4] if args.quick else [1, 2, 4, 8],
+                items=8 if args.quick else 32)
+            report["results"]["download_peak_rss_kb"] = peak_rss_kb()
+
+    report["peak_rss_kb"] = peak_rss_kb()
+    text = json.dumps(report, indent=2)
+    if args.output:
+        Path(args.output).write_text(text + "\n")
+    else:
+        print(text)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
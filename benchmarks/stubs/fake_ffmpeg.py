@@ -0,0 +1,27 @@
+"""
+Offline stand-in for ffmpeg used by the benchmark suite.
+
+Answers `-version`; an `ebur128` analysis prints a loudness summary to
+stderr and a stream copy to an output file copies the input. Everything
+else exits successfully. Each run takes FAKE_FFMPEG_S seconds (default 0).
+"""
+
+import os
+import shutil
+import sys
+import time
+
+args = sys.argv[1:]
+if "-version" in args:
+    print("ffmpeg version 0.0-benchmark-stub")
+    sys.exit(0)
+
+time.sleep(float(os.environ.get("FAKE_FFMPEG_S", 0)))
+src = args[args.index("-i") + 1] if "-i" in args else None
+if any("ebur128" in a for a in args):
+    print("[Parsed_ebur128_0 @ 0x0] Summary:\n\n"
+          "  Integrated loudness:\n    I:         -11.3 LUFS\n    Threshold: -21.5 LUFS\n\n"
+          "  Loudness range:\n    LRA:         6.2 LU\n\n"
+          "  True peak:\n    Peak:        0.4 dBFS", file=sys.stderr)
+elif src is not None and args[-1] != "-" and os.path.exists(src):
+    shutil.copyfile(src, args[-1])
@@ -0,0 +1,298 @@
+"""
+Offline stand-in for yt-dlp used by the benchmark suite.
+
+It understands the subset of yt-dlp's command line that AudioDL uses and
+prints output shaped like the real tool. Behaviour is tuned through
+environment variables:
+
+  FAKE_YTDLP_ENTRIES       playlist size                       (default 100)
+  FAKE_YTDLP_ENTRY_RATE    entries printed per second, 0 = all at once
+  FAKE_YTDLP_STARTUP_S     simulated interpreter/extractor startup
+  FAKE_YTDLP_SIZE_MB       size of each downloaded stream       (default 4)
+  FAKE_YTDLP_SPEED_MBPS    transfer speed per process, MiB/s    (default 40)
+  FAKE_YTDLP_PROGRESS_HZ   [download] lines per second          (default 20)
+  FAKE_YTDLP_POSTPROC_S    simulated ffmpeg conversion time     (default 0.05)
+  FAKE_YTDLP_THUMB_S       simulated thumbnail fetch time       (default 0.05)
+  FAKE_YTDLP_POSTPROC_CPU  1 = burn CPU during conversion instead of sleeping
+  FAKE_YTDLP_FAIL_EVERY    fail every Nth video ID (0 = never)
+  FAKE_YTDLP_FAIL_MESSAGE  error printed for those, e.g. "HTTP Error 429: Too Many Requests"
+
+--limit-rate caps the simulated transfer speed.
+
+Downloads follow the three shapes AudioDL uses: a single `-x` run, a
+pipeline fetch (`-f bestaudio --write-info-json`) and a pipeline convert
+(`--load-info-json`). Every video offers an Opus/webm and an AAC/m4a
+stream; a selector asking for `acodec^=mp4a` (or format 140) gets the
+latter. The convert run selects formats again and downloads the stream
+once more if -f picks a different one than the fetch did. When the
+stream already matches --audio-format, conversion is a quick remux.
+`--batch-file -`, `--print WHEN:TEMPLATE` and `--progress-template` are
+understood for the fields AudioDL asks for. Thumbnails go where
+`-P thumbnail:DIR -o thumbnail:TEMPLATE` say and are reused when already
+there; --embed-thumbnail deletes them afterwards unless --write-thumbnail
+was given too.
+"""
+
+import json
+import os
+import re
+import sys
+import time
+
+
+def env_float(name: str, default: float) -> float:
+    try:
+        return float(os.environ.get(name, default))
+    except ValueError:
+        return default
+
+
+def fake_entry(i: int) -> dict:
+    vid = f"{i:011d}"[-11:]
+    return {
+        "_type": "url",
+        "ie_key": "Youtube",
+        "id": vid,
+        "url": f"https://www.youtube.com/watch?v={vid}",
+        "title": f"Benchmark track {i} - Some Artist (Official Audio)",
+        "description": None,
+        "duration": 120 + (i * 37) % 480,
+        "channel_id": "UCbenchmarkchannel0000000",
+        "channel": f"Artist {i % 50}",
+        "channel_url": "https://www.youtube.com/channel/UCbenchmarkchannel0000000",
+        "uploader": f"Artist {i % 50}",
+        "uploader_id": "@artist",
+        "uploader_url": "https://www.youtube.com/@artist",
+        "thumbnails": [
+            {"url": f"https://i.ytimg.com/vi/{vid}/{name}.jpg", "height": h, "width": w}
+            for name, w, h in (("default", 120, 90), ("mqdefault", 320, 180),
+                               ("hqdefault", 480, 360), ("sddefault", 640, 480))
+        ],
+        "timestamp": None,
+        "release_timestamp": None,
+        "availability": None,
+        "view_count": 1000 + i,
+        "live_status": None,
+        "channel_is_verified": None,
+    }
+
+
+def list_playlist(args: list[str]):
+    count = int(env_float("FAKE_YTDLP_ENTRIES", 100))
+    rate = env_float("FAKE_YTDLP_ENTRY_RATE", 0)
+    if "-J" in args:
+        if rate:
+            time.sleep(count / rate)
+        print(json.dumps({"_type": "playlist", "id": "PLbenchmark", "title": "Benchmark",
+                          "entries": [fake_entry(i) for i in range(count)]}))
+        return
+    for i in range(count):
+        print(json.dumps(fake_entry(i)), flush=bool(rate))
+        if rate:
+            time.sleep(1 / rate)
+
+
+def arg_value(args: list[str], flag: str, default=None):
+    return args[args.index(flag) + 1] if flag in args else default
+
+
+def arg_values(args: list[str], flag: str) -> list[str]:
+    return [args[i + 1] for i, a in enumerate(args[:-1]) if a == flag]
+
+
+def typed_value(args: list[str], flag: str, kind: str | None = None, default=None):
+    """Value of `-P`/`-o` for one output type ("thumbnail") or for the default type."""
+    for value in arg_values(args, flag):
+        prefix, sep, rest = value.partition(":")
+        if kind is not None and sep and prefix == kind:
+            return rest
+        if kind is None and not (sep and prefix == "thumbnail"):
+            return value
+    return default
+
+
+def fill(template: str, fields: dict) -> str:
+    """Expand %(a,b|default)s like yt-dlp's output templates do."""
+    def sub(m):
+        names, _, default = m.group(1).partition("|")
+        for name in names.split(","):
+            if fields.get(name) is not None:
+                return str(fields[name])
+        return default or "NA"
+    return re.sub(r"%\(([^)]+)\)s", sub, template)
+
+
+def print_hooks(args: list[str], when: str, fields: dict):
+    for spec in arg_values(args, "--print"):
+        if spec.startswith(when + ":"):
+            print(fill(spec.split(":", 1)[1], fields), flush=True)
+
+
+# format id, ext, acodec
+STREAMS = {"opus": ("251", "webm", "opus"), "aac": ("140", "m4a", "mp4a.40.2")}
+
+
+def pick_stream(args: list[str]) -> tuple[str, str, str]:
+    selector = arg_value(args, "-f", "bestaudio/best")
+    for stream in STREAMS.values():
+        if selector == stream[0]:
+            return stream
+    return STREAMS["aac" if "acodec^=mp4a" in selector else "opus"]
+
+
+def write_thumbnail(args: list[str], base: str, vid: str) -> str | None:
+    if "--write-thumbnail" not in args and "--embed-thumbnail" not in args:
+        return None
+    folder = typed_value(args, "-P", "thumbnail")
+    if folder is not None:
+        name = fill(typed_value(args, "-o", "thumbnail", "%(id)s.%(ext)s"), {"id": vid, "ext": "webm"})
+        path = os.path.join(folder, os.path.splitext(name)[0] + ".webp")
+    else:
+        path = f"{base}.webp"
+    if os.path.exists(path):
+        print("[info] Video thumbnail is already present")
+        return path
+    print("[info] Downloading video thumbnail 41 ...", flush=True)
+    time.sleep(env_float("FAKE_YTDLP_THUMB_S", 0.05))
+    print(f"[info] Writing video thumbnail 41 to: {path}")
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path, "wb") as fh:
+        fh.write(b"RIFF\0\0\0\0WEBP")
+    return path
+
+
+def embed_thumbnail(args: list[str], path: str, thumb: str | None):
+    if "--embed-thumbnail" not in args or thumb is None:
+        return
+    print(f'[EmbedThumbnail] ffmpeg: Adding thumbnail to "{path}"')
+    if "--write-thumbnail" not in args and os.path.exists(thumb):
+        os.remove(thumb)
+
+
+def postprocess(base: str, src_ext: str, acodec: str, args: list[str], thumb: str | None = None):
+    ext = arg_value(args, "--audio-format", "m4a")
+    copy = acodec.startswith({"m4a": "mp4a", "aac": "mp4a"}.get(ext, ext))
+    if copy and ext == src_ext:
+        print(f"[ExtractAudio] Not converting audio {base}.{src_ext}; file is already in target format {ext}")
+        embed_thumbnail(args, f"{base}.{ext}", thumb)
+        return
+    print(f"[ExtractAudio] Destination: {base}.{ext}", flush=True)
+    secs = env_float("FAKE_YTDLP_POSTPROC_S", 0.05) * (0.1 if copy else 1)
+    if os.environ.get("FAKE_YTDLP_POSTPROC_CPU") == "1":
+        end = time.perf_counter() + secs
+        while time.perf_counter() < end:
+            pass
+    else:
+        time.sleep(secs)
+    open(f"{base}.{ext}", "wb").close()
+    print(f"Deleting original file {base}.{src_ext} (pass -k to keep)")
+    if os.path.exists(f"{base}.{src_ext}"):
+        os.remove(f"{base}.{src_ext}")
+    embed_thumbnail(args, f"{base}.{ext}", thumb)
+
+
+def convert(args: list[str]):
+    info_path = arg_value(args, "--load-info-json")
+    with open(info_path, encoding="utf-8") as fh:
+        info = json.load(fh)
+    base, src_ext = os.path.splitext(info["_filename"])
+    # Formats are selected again, like yt-dlp does; without a matching -f
+    # the other stream is downloaded on top of the fetched one.
+    format_id, ext, acodec = pick_stream(args)
+    print(f"[info] {info['id']}: Downloading 1 format(s): {format_id}")
+    thumb = write_thumbnail(args, base, info["id"])
+    if format_id == info["format_id"]:
+        print(f"[download] {info['_filename']} has already been downloaded", flush=True)
+    else:
+        size = env_float("FAKE_YTDLP_SIZE_MB", 4)
+        speed = max(0.001, env_float("FAKE_YTDLP_SPEED_MBPS", 40))
+        print(f"[download] Destination: {base}.{ext}", flush=True)
+        time.sleep(size / speed)
+        print(f"[download] 100% of {size:8.2f}MiB in 00:00:{int(size / speed):02d} at {speed:.2f}MiB/s")
+        open(f"{base}.{ext}", "wb").close()
+        src_ext = "." + ext
+    postprocess(base, src_ext[1:], acodec, args, thumb)
+
+
+def download(args: list[str]):
+    if arg_value(args, "--batch-file") == "-":
+        urls = [line.strip() for line in sys.stdin if line.strip()]
+    else:
+        urls = [args[-1]]
+    failed = False
+    for url in urls:
+        if not download_one(url, args):
+            failed = True
+            if "--ignore-errors" not in args:
+                break
+    sys.exit(1 if failed else 0)
+
+
+def download_one(url: str, args: list[str]) -> bool:
+    vid = url.rsplit("=", 1)[-1]
+    out_dir = typed_value(args, "-P", default=".")
+    pipeline = "-x" not in args
+
+    size = env_float("FAKE_YTDLP_SIZE_MB", 4)
+    speed = max(0.001, env_float("FAKE_YTDLP_SPEED_MBPS", 40))
+    if "--limit-rate" in args:
+        speed = min(speed, int(arg_value(args, "--limit-rate")) / 1024 ** 2)
+    hz = max(1.0, env_float("FAKE_YTDLP_PROGRESS_HZ", 20))
+    base = os.path.join(out_dir, f"Benchmark track [{vid}]")
+    format_id, src_ext, acodec = pick_stream(args)
+    media = f"{base}.{src_ext}"
+
+    print(f"[youtube] Extracting URL: {url}")
+    every = int(env_float("FAKE_YTDLP_FAIL_EVERY", 0))
+    if every and int(vid) % every == every - 1:
+        message = os.environ.get("FAKE_YTDLP_FAIL_MESSAGE", "Video unavailable")
+        print(f"ERROR: [youtube] {vid}: {message}", flush=True)
+        return False
+    print(f"[info] {vid}: Downloading 1 format(s): {format_id}")
+    thumb = write_thumbnail(args, base, vid)
+    if "--write-info-json" in args:
+        print(f"[info] Writing video metadata as JSON to: {base}.info.json")
+        with open(f"{base}.info.json", "w", encoding="utf-8") as fh:
+            json.dump({"id": vid, "_filename": media, "format_id": format_id,
+                       "ext": src_ext, "acodec": acodec}, fh)
+    fields = {"id": vid, "acodec": acodec, "ext": src_ext, "filesize": int(size * 1024 ** 2),
+              "info.id": vid}
+    print_hooks(args, "before_dl", fields)
+    template = arg_value(args, "--progress-template", "").removeprefix("download:")
+    print(f"[download] Destination: {media}", flush=True)
+    total = size / speed
+    steps = max(1, int(total * hz))
+    for step in range(1, steps + 1):
+        time.sleep(total / steps)
+        pct = 100 * step / steps
+        eta = int(total - total * step / steps)
+        if template:
+            print(fill(template, {**fields, "progress._percent_str": f"{pct:5.1f}%",
+                                  "progress._speed_str": f"{speed:8.2f}MiB/s",
+                                  "progress._eta_str": f"00:{eta:02d}"}), flush=True)
+        else:
+            print(f"[download] {pct:5.1f}% of {size:8.2f}MiB at {speed:8.2f}MiB/s ETA 00:{eta:02d}", flush=True)
+    if not template:
+        print(f"[download] 100% of {size:8.2f}MiB in 00:00:{int(total):02d} at {speed:.2f}MiB/s")
+    open(media, "wb").close()
+    if not pipeline:
+        postprocess(base, src_ext, acodec, args, thumb)
+    print_hooks(args, "after_move", fields)
+    return True
+
+
+def main():
+    time.sleep(env_float("FAKE_YTDLP_STARTUP_S", 0))
+    args = sys.argv[1:]
+    if "--version" in args:
+        print("2099.01.01 (benchmark stub)")
+    elif "--flat-playlist" in args:
+        list_playlist(args)
+    elif "--load-info-json" in args:
+        convert(args)
+    else:
+        download(args)
+
+
+if __name__ == "__main__":
+    main()
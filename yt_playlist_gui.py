@@ -9,81 +9,184 @@ Fixed and cleaned version of YouTube Playlist Audio Downloader GUI
 """
 
 import os
-import re
-import json
 import queue
 import threading
-import subprocess
+import time
 import tkinter as tk
 from pathlib import Path
 from tkinter import ttk, filedialog, messagebox
 
+from audiodl.archive import DownloadArchive
+from audiodl.entries import Entry
+from audiodl.journal import JobJournal
+from audiodl.library import Library
+from audiodl.loudness import Normalizer, DEFAULT_TARGET_LUFS
+from audiodl.metrics import Metrics
+from audiodl.core import (
+    FFMPEG_EXE, DEFAULT_OUT_DIR, CACHE_DIR, JOURNAL_FILE, METRICS_LOG, LIBRARY_FILE,
+    THUMBNAIL_DIR, LOUDNESS_FILE,
+    DEFAULT_CONCURRENCY, DEFAULT_RETRIES, DEFAULT_PIPELINE, DEFAULT_BATCH_SIZE, AUDIO_FORMATS, REMUX, TRANSCODE, LIBRARY,
+    iter_playlist, fetch_playlist, fetch_playlists, parse_url_list, DEFAULT_FETCH_WORKERS, fmt_dur, load_settings, save_settings,
+    build_scheduler,
+)
+from audiodl.playlist_cache import PlaylistCache, playlist_key, merge_entries, merge_playlists, source_label
+from audiodl.search import SearchIndex
+from audiodl.thumbnails import ThumbnailCache
+from audiodl.throttle import parse_rate, describe as describe_network
+from audiodl.scheduler import (
+    DownloadScheduler, QUEUED, FAILED, FINAL_STATES,
+)
+
 # ------------------------------------------------------------------
 # CONFIGURATION
 # ------------------------------------------------------------------
-BASE_DIR        = Path(__file__).resolve().parent
-YTDLP_EXE       = BASE_DIR / "yt-dlp.exe"
-FFMPEG_EXE      = BASE_DIR / "ffmpeg" / "bin" / "ffmpeg.exe"
-DEFAULT_OUT_DIR = BASE_DIR / "Musiques"
-SETTINGS_FILE   = BASE_DIR / "settings.json"
+SEARCH_DEBOUNCE_MS  = 150
+POLL_ACTIVE_MS      = 30
+POLL_IDLE_MS        = 250
+POLL_IDLE_AFTER     = 2.0   # seconds without messages before slowing down
+POLL_BATCH          = 500   # max messages handled per tick
+STREAM_BATCH        = 200   # playlist entries per "entries" message
+STREAM_FLUSH_S      = 0.25  # max delay before a partial batch is sent
+PREVIEW_DELAY_MS    = 200   # hover time before a thumbnail preview loads
+PREVIEW_MEMORY      = 100   # preview images kept in memory
 
 # ------------------------------------------------------------------
-# UTILITIES
+# WIDGETS
 # ------------------------------------------------------------------
-def run(cmd: list[str]) -> subprocess.CompletedProcess:
-    return subprocess.run(cmd, capture_output=True, text=True)
-
-
-def fetch_playlist(url: str) -> list[dict]:
-    res = run([str(YTDLP_EXE), "--flat-playlist", "-J", url])
-    if res.returncode != 0:
-        raise RuntimeError(res.stderr or "yt-dlp failed to fetch playlist.")
-    data = json.loads(res.stdout)
-    if "entries" not in data:
-        raise RuntimeError("Invalid playlist URL or access denied.")
-    return data["entries"]
-
-
-def fmt_dur(sec: int | None) -> str:
-    if sec is None:
-        return "?"
-    m, s = divmod(sec, 60)
-    h, m = divmod(m, 60)
-    return f"{h:02d}:{m:02d}:{s:02d}" if h else f"{m:02d}:{s:02d}"
-
-
-def load_settings() -> dict:
-    if SETTINGS_FILE.exists():
-        return json.loads(SETTINGS_FILE.read_text())
-    return {}
-
-
-def save_settings(settings: dict):
-    SETTINGS_FILE.write_text(json.dumps(settings, indent=2))
-
-
-def download_audio(video_id: str, out_dir: Path, q: queue.Queue, audio_format: str):
-    cmd = [
-        str(YTDLP_EXE),
-        "-x", "--audio-format", audio_format,
-        "--embed-thumbnail", "--add-metadata",
-        "--ffmpeg-location", str(FFMPEG_EXE),
-        "-P", str(out_dir),
-        f"https://www.youtube.com/watch?v={video_id}",
-    ]
-    proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True)
-    pattern = re.compile(r"[download]\s*(?P<pct>[0-9.]+)%.*?at\s*(?P<spd>\S+)\s*ETA\s*(?P<eta>[0-9:]+)")
-    for line in proc.stdout:
-        m = pattern.search(line)
-        if m:
-            pct = float(m.group("pct"))
-            spd = m.group("spd")
-            eta = m.group("eta")
-            q.put(("progress", pct, spd, eta))
-        elif "WARNING: [AtomicParsley]" in line:
-            q.put(("warning", line.strip()))
-    proc.wait()
-    q.put(("done", video_id, proc.returncode == 0))
+class VirtualCheckList(tk.Canvas):
+    """
+    Check list that only keeps canvas items for the rows currently on screen.
+
+    Row data lives in plain lists owned by the caller (`texts`, `selected`,
+    `downloaded`, all indexed the same way); `rows` holds the ordered indices
+    that are shown. Scrolling and toggling just reconfigure a small pool of
+    items, so the cost does not depend on the number of entries.
+    """
+    ROW_HEIGHT = 24
+
+    def __init__(self, master, on_toggle=None, on_hover=None, **kw):
+        super().__init__(master, highlightthickness=0, **kw)
+        self.on_toggle = on_toggle
+        self.on_hover = on_hover
+        self.yscrollcommand = None
+        self.texts: list[str] = []
+        self.selected: list[bool] = []
+        self.downloaded: list[bool] = []
+        self.rows: list[int] = []
+        self.colors = {"bg": "#ffffff", "fg": "#333333", "muted": "#777777",
+                       "selected": "#d4edda", "downloaded": "#ffeeba"}
+        self.font = ("Segoe UI", 10)
+        self._offset = 0
+        self._pool = []  # (rect, box, label) item ids reused across redraws
+        self.bind("<Configure>", lambda e: self.redraw())
+        self.bind("<Button-1>", self._on_click)
+        self.bind("<Motion>", self._on_motion)
+
+    def set_data(self, texts: list[str], selected: list[bool], downloaded: list[bool]):
+        self.texts, self.selected, self.downloaded = texts, selected, downloaded
+        self.show_rows(range(len(texts)))
+
+    def show_rows(self, rows):
+        self.rows = list(rows)
+        self._offset = 0
+        self.redraw()
+
+    def add_rows(self, rows):
+        """Append rows below the current ones without moving the view."""
+        self.rows.extend(rows)
+        self.redraw()
+
+    def set_colors(self, font=None, **colors):
+        self.colors.update(colors)
+        if font is not None:
+            self.font = font
+            for _, box, label in self._pool:
+                self.itemconfigure(box, font=font)
+                self.itemconfigure(label, font=font)
+        self.configure(background=self.colors["bg"])
+        self.redraw()
+
+    # ---------------- SCROLLING ----------------
+    def yview(self, *args):
+        height = max(1, self.winfo_height())
+        total = len(self.rows) * self.ROW_HEIGHT
+        if not args:
+            if not total:
+                return 0.0, 1.0
+            return self._offset / total, min(1.0, (self._offset + height) / total)
+        if args[0] == "moveto":
+            self._offset = float(args[1]) * total
+        elif args[0] == "scroll":
+            step = self.ROW_HEIGHT if args[2] == "units" else height
+            self._offset += int(args[1]) * step
+        self.redraw()
+
+    def yview_scroll(self, number, what):
+        self.yview("scroll", number, what)
+
+    def yview_moveto(self, fraction):
+        self.yview("moveto", fraction)
+
+    # ---------------- DRAWING ----------------
+    def redraw(self):
+        rh = self.ROW_HEIGHT
+        width, height = self.winfo_width(), self.winfo_height()
+        total = len(self.rows) * rh
+        self._offset = max(0, min(self._offset, total - height))
+        first = int(self._offset // rh)
+        last = min(len(self.rows), int((self._offset + height) // rh) + 1)
+
+        while len(self._pool) < last - first:
+            self._pool.append((
+                self.create_rectangle(0, 0, 0, 0, width=0),
+                self.create_text(0, 0, anchor="w", font=self.font),
+                self.create_text(0, 0, anchor="w", font=self.font),
+            ))
+
+        c = self.colors
+        for slot, (rect, box, label) in enumerate(self._pool):
+            pos = first + slot
+            if pos >= last:
+                for item in (rect, box, label):
+                    self.itemconfigure(item, state="hidden")
+                continue
+            i = self.rows[pos]
+            y = pos * rh - self._offset
+            done = self.downloaded[i]
+            sel = self.selected[i]
+            fill = c["downloaded"] if done else c["selected"] if sel else c["bg"]
+            self.coords(rect, 0, y + 1, width, y + rh - 1)
+            self.itemconfigure(rect, fill=fill, state="normal")
+            self.coords(box, 8, y + rh / 2)
+            self.itemconfigure(box, text="\u2611" if sel else "\u2610",
+                               fill=c["muted"] if done else c["fg"], state="normal")
+            self.coords(label, 30, y + rh / 2)
+            self.itemconfigure(label, text=self.texts[i],
+                               fill=c["muted"] if done else c["fg"], state="normal")
+
+        if self.yscrollcommand is not None:
+            self.yscrollcommand(*self.yview())
+
+    def row_at(self, y: int) -> int | None:
+        """Index of the row drawn at canvas height `y`, if any."""
+        pos = int((self._offset + y) // self.ROW_HEIGHT)
+        return self.rows[pos] if 0 <= pos < len(self.rows) else None
+
+    def _on_motion(self, event):
+        i = self.row_at(event.y)
+        if i is not None and self.on_hover is not None:
+            self.on_hover(i)
+
+    def _on_click(self, event):
+        i = self.row_at(event.y)
+        if i is None:
+            return
+        if self.downloaded[i]:
+            return
+        self.selected[i] = not self.selected[i]
+        self.redraw()
+        if self.on_toggle is not None:
+            self.on_toggle(i)
 
 # ------------------------------------------------------------------
 # MAIN APPLICATION CLASS
@@ -101,6 +204,10 @@ class App(tk.Tk):
         self.theme_var = tk.StringVar(value=self.settings.get("theme", "light"))
         self.ttk_theme_var = tk.StringVar(value=self.settings.get("ttk_theme", "clam")) # Changed default to "clam"
         self.format_var = tk.StringVar(value="aac") # NEW
+        self.concurrency_var = tk.IntVar(value=self.settings.get("concurrency", DEFAULT_CONCURRENCY))
+        self.rate_limit_var = tk.StringVar(value=self.settings.get("rate_limit", ""))
+        self.adaptive_var = tk.BooleanVar(value=self.settings.get("adaptive_concurrency", False))
+        self.preview_var = tk.BooleanVar(value=self.settings.get("thumbnail_previews", False))
         self.selected_count = tk.IntVar(value=0)
         self.search_var = tk.StringVar()
         self.search_var.trace_add("write", self._filter_list)
@@ -108,7 +215,52 @@ class App(tk.Tk):
         self.queue = queue.Queue()
         self.warnings = []
         self.entries = []
-        self.check_vars = []
+        self.entries_shown = []
+        self.search_index = SearchIndex([])
+        self._filter_after_id = None
+        self.selected = []
+        self.downloaded = []
+        self.scheduler = None
+        self.job_states = {}
+        self.job_progress = {}
+        self.job_paths = {}
+        self.progress_text = ""
+        self.network_text = ""
+        self._preview_vid = None
+        self._preview_after_id = None
+        self._preview_images = {}  # video ID -> PhotoImage, oldest first
+        self._status_dirty = False
+        self._last_message_at = 0.0
+        self._next_poll_at = None
+        self.poll_stats = {
+            "ticks": 0, "messages": 0, "coalesced": 0, "max_batch": 0,
+            "queue_depth": 0, "max_queue_depth": 0, "lag_ms": 0.0, "max_lag_ms": 0.0,
+        }
+        self.playlist_cache = PlaylistCache(
+            CACHE_DIR / "playlists",
+            ttl=self.settings.get("playlist_cache_ttl_hours", 6) * 3600,
+        )
+        self.current_playlist = None
+        self.journal = JobJournal(JOURNAL_FILE)
+        self.library = None
+        if self.settings.get("library", True):
+            self.library = Library(LIBRARY_FILE, hash_files=self.settings.get("library_hash", False))
+        self.thumbnails = None
+        if self.settings.get("thumbnail_cache", True):
+            self.thumbnails = ThumbnailCache(
+                THUMBNAIL_DIR, max_bytes=self.settings.get("thumbnail_cache_mb", 300) * 1024 * 1024,
+                ffmpeg=FFMPEG_EXE,
+            )
+        self.metrics = Metrics(
+            log_path=self.settings.get("metrics_log", METRICS_LOG),
+            prometheus_path=self.settings.get("metrics_prometheus_file"),
+        )
+        if self.settings.get("metrics_http_port"):
+            try:
+                self.metrics.serve(int(self.settings["metrics_http_port"]))
+            except (OSError, ValueError) as e:
+                self.warnings.append(f"Metrics endpoint not started: {e}")
+        self._analyze_cancel = threading.Event()
 
         # Build UI
         self._build_menu()
@@ -122,17 +274,28 @@ class App(tk.Tk):
         self.bind_all("<Control-d>", lambda e: self.deselect_all())
 
         # Poll queue
-        self.after(100, self._poll_queue)
+        self.after(POLL_IDLE_MS, self._poll_queue)
 
         # On close
         self.protocol("WM_DELETE_WINDOW", self._on_close)
 
+        # Offer to pick up downloads interrupted in a previous session
+        self.after(500, self._offer_resume)
+
     def _on_close(self):
         self.settings["last_url"] = self.url_var.get()
         self.settings["output_directory"] = self.out_dir_var.get()
         self.settings["theme"] = self.theme_var.get()
         self.settings["ttk_theme"] = self.ttk_theme_var.get() # NEW
+        self.settings["concurrency"] = self._get_concurrency()
+        self.settings["rate_limit"] = self.rate_limit_var.get().strip()
+        self.settings["adaptive_concurrency"] = self.adaptive_var.get()
+        self.settings["thumbnail_previews"] = self.preview_var.get()
         save_settings(self.settings)
+        if self.scheduler is not None:
+            # Keep unfinished jobs in the journal so they can be resumed.
+            self.journal.close()
+            self.scheduler.cancel()
         self.destroy()
 
     # ---------------- MENU ----------------
@@ -140,6 +303,11 @@ class App(tk.Tk):
         menu = tk.Menu(self)
         filem = tk.Menu(menu, tearoff=False)
         filem.add_command(label="Open Output Folder", command=self.open_out_dir)
+        filem.add_command(label="Load URL List...", command=self.load_url_list)
+        filem.add_command(label="Clear Playlist Cache", command=self.playlist_cache.clear)
+        if self.thumbnails is not None:
+            filem.add_command(label="Clear Thumbnail Cache", command=self.thumbnails.clear)
+        filem.add_command(label="Queue Statistics", command=self.show_poll_stats)
         filem.add_separator()
         filem.add_command(label="Exit", command=self._on_close)
         menu.add_cascade(label="File", menu=filem)
@@ -151,6 +319,9 @@ class App(tk.Tk):
         # Add ttk themes
         for th in ttk.Style().theme_names():
             themem.add_radiobutton(label=th.capitalize(), variable=self.ttk_theme_var, value=th, command=self._apply_theme)
+        if self.thumbnails is not None:
+            themem.add_separator()
+            themem.add_checkbutton(label="Thumbnail Previews", variable=self.preview_var, command=self._toggle_previews)
         menu.add_cascade(label="Theme", menu=themem)
         self.config(menu=menu)
 
@@ -163,8 +334,13 @@ class App(tk.Tk):
         ttk.Label(frame, text="Search:").pack(side="left", padx=(15,5))
         ttk.Entry(frame, textvariable=self.search_var, width=30).pack(side="left", fill="x", padx=(0,5))
         ttk.Label(frame, text="Format:").pack(side="left", padx=(15,5))
-        format_options = ["aac", "mp3", "flac", "wav"]
+        format_options = list(AUDIO_FORMATS)
         ttk.Combobox(frame, textvariable=self.format_var, values=format_options, width=8).pack(side="left", padx=(0,5))
+        ttk.Label(frame, text="Parallel:").pack(side="left", padx=(15,5))
+        ttk.Spinbox(frame, textvariable=self.concurrency_var, from_=1, to=16, width=4).pack(side="left", padx=(0,5))
+        ttk.Checkbutton(frame, text="Auto", variable=self.adaptive_var).pack(side="left", padx=(0,5))
+        ttk.Label(frame, text="Limit:").pack(side="left", padx=(15,5))
+        ttk.Entry(frame, textvariable=self.rate_limit_var, width=6).pack(side="left", padx=(0,5))
         ttk.Label(frame, text="Output:").pack(side="left", padx=(15,5))
         ttk.Entry(frame, textvariable=self.out_dir_var, width=30).pack(side="left", fill="x", padx=(0,5))
         ttk.Button(frame, text="…", width=3, command=self.open_select_out).pack(side="left")
@@ -173,16 +349,15 @@ class App(tk.Tk):
     def _build_checklist(self):
         wrap = ttk.Frame(self)
         wrap.pack(expand=True, fill="both", padx=10, pady=5)
-        self.canvas = tk.Canvas(wrap)
+        self.canvas = VirtualCheckList(wrap, on_toggle=lambda i: self._update_selected_count(),
+                                       on_hover=self._on_row_hover)
         vsb = ttk.Scrollbar(wrap, orient="vertical", command=self.canvas.yview, style="Vertical.TScrollbar")
-        self.list_frame = ttk.Frame(self.canvas)
-        self.canvas.create_window((0,0), window=self.list_frame, anchor="nw")
-        self.canvas.configure(yscrollcommand=vsb.set)
-        self.list_frame.bind("<Configure>", self._on_frame_configure)
+        self.canvas.yscrollcommand = vsb.set
         self.canvas.pack(side="left", fill="both", expand=True)
         vsb.pack(side="right", fill="y")
+        self.preview_lbl = ttk.Label(wrap, anchor="n")
+        self._toggle_previews()
         self._bind_scroll(self.canvas)
-        self._bind_scroll(self.list_frame)
 
         ctrl = ttk.Frame(self)
         ctrl.pack(fill="x", padx=10)
@@ -190,6 +365,9 @@ class App(tk.Tk):
         ttk.Button(ctrl, text="Deselect All", command=self.deselect_all).pack(side="left", padx=5)
         ttk.Button(ctrl, text="Refresh", command=self._refresh_downloaded_status).pack(side="left", padx=5)
         ttk.Button(ctrl, text="Download Selected", command=self.download_selected).pack(side="right")
+        self.cancel_btn = ttk.Button(ctrl, text="Cancel", command=self.cancel_downloads)
+        self.cancel_btn.pack(side="right", padx=5)
+        self.cancel_btn.state(["disabled"])
 
     # ---------------- FOOTER ----------------
     def _build_footer(self):
@@ -235,13 +413,13 @@ class App(tk.Tk):
                   background=[("active", accent_color)],
                   foreground=[("active", "#ffffff")])
 
-        # Styles for list items
-        style.configure("Downloaded.TFrame", background=self.downloaded_highlight_color)
-        style.configure("Selected.TFrame", background=self.selected_highlight_color)
-        style.configure("Downloaded.TCheckbutton", background=self.downloaded_highlight_color, foreground=fg, font=("Segoe UI", 10))
-        style.configure("Selected.TCheckbutton", background=self.selected_highlight_color, foreground=fg, font=("Segoe UI", 10))
-
-        self.canvas.configure(background=bg)
+        # Colors for list rows
+        self.canvas.set_colors(
+            font=("Segoe UI", 10), bg=bg, fg=fg,
+            muted="#8a8f98" if dark else "#777777",
+            selected=self.selected_highlight_color,
+            downloaded=self.downloaded_highlight_color,
+        )
 
         # Scrollbar styling
         scrollbar_bg = "#44475a" if dark else "#e0e0e0"
@@ -253,159 +431,524 @@ class App(tk.Tk):
 
     # ---------------- ANALYZE ----------------
     def analyze(self):
-        url = self.url_var.get().strip()
-        if not url:
+        urls = parse_url_list(self.url_var.get())
+        if not urls:
             messagebox.showinfo("Info", "Please paste a playlist URL.")
             return
-        self.settings["last_url"] = url
+        self.settings["last_url"] = self.url_var.get().strip()
         save_settings(self.settings)
         self._lock_ui()
         self.status_lbl.configure(text="Analyzing playlist...")
         self.progress.configure(mode="indeterminate"); self.progress.start()
-        threading.Thread(target=self._analyze_worker, args=(url,), daemon=True).start()
-
-    def _analyze_worker(self, url: str):
+        self.current_playlist = " ".join(playlist_key(url) for url in urls)
+        # Stop a listing that is still streaming in for the previous URL.
+        self._analyze_cancel.set()
+        self._analyze_cancel = threading.Event()
+        if len(urls) == 1:
+            target, arg = self._analyze_worker, urls[0]
+        else:
+            target, arg = self._multi_analyze_worker, urls
+        threading.Thread(target=target, args=(arg, self.current_playlist, self._analyze_cancel), daemon=True).start()
+
+    def load_url_list(self):
+        path = filedialog.askopenfilename(
+            title="Load URL list", filetypes=[("Text files", "*.txt"), ("All files", "*.*")],
+        )
+        if not path:
+            return
         try:
-            entries = fetch_playlist(url)
+            urls = parse_url_list(Path(path).read_text(encoding="utf-8"))
+        except OSError as e:
+            messagebox.showerror("Error", str(e))
+            return
+        self.url_var.set(" ".join(urls))
+        self.analyze()
+
+    def _analyze_worker(self, url: str, key: str, cancel: threading.Event):
+        cached = self.playlist_cache.get(key)
+        if cached is not None:
+            entries, fetched_at = cached
             self.entries = entries
             self.queue.put(("populate", None))
+            if self.playlist_cache.is_fresh(fetched_at):
+                return
+            self.queue.put(("status", "Showing cached playlist, refreshing in background..."))
+        else:
+            self._stream_worker(url, key, cancel)
+            return
+        try:
+            fresh = fetch_playlist(url)
+            self.playlist_cache.put(key, fresh)
+        except Exception as e:
+            self.queue.put(("refresh_failed", key, str(e)))
+            return
+        self.queue.put(("playlist_diff", key, fresh))
+
+    def _multi_analyze_worker(self, urls: list[str], key: str, cancel: threading.Event):
+        def fetch(url: str) -> list[Entry]:
+            pkey = playlist_key(url)
+            cached = self.playlist_cache.get(pkey)
+            if cached is not None and self.playlist_cache.is_fresh(cached[1]):
+                return cached[0]
+            entries = list(iter_playlist(url, cancel))
+            if not cancel.is_set():
+                self.playlist_cache.put(pkey, entries)
+            return entries
+
+        listings, failed = {}, []
+        workers = self.settings.get("analyze_workers", DEFAULT_FETCH_WORKERS)
+        for url, entries, error in fetch_playlists(urls, workers, fetch, cancel):
+            if error is not None:
+                failed.append(f"{url}: {str(error).strip()}")
+            else:
+                listings[url] = entries
+            if not listings:
+                if len(failed) == len(urls):
+                    self.queue.put(("error", "\n".join(failed)))
+                continue
+            # Re-merge in URL order so rows do not jump around as fetches finish.
+            merged = merge_playlists([(source_label(u, listings[u]), listings[u]) for u in urls if u in listings])
+            self.queue.put(("merged", key, merged, len(listings) + len(failed), len(urls), list(failed)))
+
+    def _stream_worker(self, url: str, key: str, cancel: threading.Event):
+        self.queue.put(("stream_start", key))
+        collected, batch = [], []
+        last_flush = 0.0
+        try:
+            for entry in iter_playlist(url, cancel):
+                batch.append(entry)
+                now = time.monotonic()
+                if len(batch) >= STREAM_BATCH or now - last_flush >= STREAM_FLUSH_S:
+                    collected.extend(batch)
+                    self.queue.put(("entries", key, batch))
+                    batch, last_flush = [], now
         except Exception as e:
+            # Show what arrived, but never cache a listing that broke off.
+            if batch:
+                self.queue.put(("entries", key, batch))
             self.queue.put(("error", str(e)))
+            return
+        if batch:
+            collected.extend(batch)
+            self.queue.put(("entries", key, batch))
+        if cancel.is_set():
+            return
+        self.playlist_cache.put(key, collected)
+        self.queue.put(("stream_done", key))
 
-    def _filter_list(self, *args):
-        search_term = self.search_var.get().lower()
-        if search_term:
-            filtered_entries = [
-                e for e in self.entries
-                if search_term in e.get("title", "").lower()
-            ]
+    def _start_stream(self, key: str):
+        if key != self.current_playlist:
+            return
+        self.entries = []
+        self._populate_list()
+        self.status_lbl.configure(text="Loading playlist...")
+        self.progress.configure(mode="indeterminate"); self.progress.start()
+
+    def _append_entries(self, key: str, batch: list[Entry]):
+        if key != self.current_playlist:
+            return
+        existing = DownloadArchive.for_directory(Path(self.out_dir_var.get()))
+        start = len(self.entries_shown)
+        for e in batch:
+            text, sel, done = self._row_state(e, existing, {})
+            self.canvas.texts.append(text)
+            self.selected.append(sel)
+            self.downloaded.append(done)
+        self.entries_shown.extend(batch)
+        self.search_index.extend(batch)
+        if self.search_var.get():
+            self._apply_filter()
         else:
-            filtered_entries = self.entries
-        self._populate_list(filtered_entries)
+            self.canvas.add_rows(range(start, len(self.entries_shown)))
+        self._update_selected_count()
+        if self.scheduler is None:
+            self.status_lbl.configure(text=f"Loading playlist... {len(self.entries_shown)} videos so far")
+
+    def _finish_stream(self, key: str):
+        if key != self.current_playlist or self.scheduler is not None:
+            return
+        self.progress.stop()
+        self.status_lbl.configure(text=f"Playlist: {len(self.entries_shown)} videos loaded.")
+
+    def _apply_merged(self, key: str, entries: list[Entry], done: int, total: int, failed: list[str]):
+        if key != self.current_playlist:
+            return
+        self.entries = entries
+        self._populate_list()
+        if self.scheduler is not None:
+            self.warnings.extend(f"Playlist failed: {f}" for f in failed if done == total)
+            return
+        if done < total:
+            self.progress.configure(mode="indeterminate"); self.progress.start()
+            self.status_lbl.configure(
+                text=f"Loading playlists... {done}/{total} done • {len(entries)} unique videos")
+            return
+        text = f"{total} playlists: {len(entries)} unique videos loaded."
+        if failed:
+            text += f" {len(failed)} failed."
+        self.status_lbl.configure(text=text)
+        if failed:
+            messagebox.showwarning("Some playlists failed", "\n".join(failed))
+
+    def _refresh_failed(self, key: str, error: str):
+        if key != self.current_playlist:
+            return
+        if self.scheduler is not None:
+            # Reported with the other warnings once the downloads finish.
+            self.warnings.append(f"Background refresh failed: {error}")
+        else:
+            self.status_lbl.configure(text=f"Background refresh failed: {error}")
+
+    def _apply_playlist_diff(self, key: str, fresh: list[Entry]):
+        if key != self.current_playlist:
+            return  # another playlist was analyzed meanwhile
+        merged, added, removed = merge_entries(self.entries, fresh)
+        if not added and not removed:
+            if self.scheduler is None:
+                self.status_lbl.configure(text=f"Playlist: {len(self.entries)} videos loaded (up to date).")
+            return
+        self.entries = merged
+        self._populate_list()
+        if self.scheduler is not None:
+            return
+        self.status_lbl.configure(
+            text=f"Playlist: {len(merged)} videos loaded ({len(added)} new, {len(removed)} removed)."
+        )
+
+    def _filter_list(self, *args):
+        # Debounce keystrokes; the actual filtering runs once typing pauses.
+        if self._filter_after_id is not None:
+            self.after_cancel(self._filter_after_id)
+        self._filter_after_id = self.after(SEARCH_DEBOUNCE_MS, self._apply_filter)
+
+    def _apply_filter(self):
+        self._filter_after_id = None
+        self.canvas.show_rows(self.search_index.search(self.search_var.get()))
+        self._update_selected_count()
 
     # ---------------- DOWNLOAD ----------------
     def download_selected(self):
-        selected = [vid for var,vid in self.check_vars if var.get()]
+        selected = [self.entries_shown[i].id for i in self.canvas.rows if self.selected[i]]
         if not selected:
             messagebox.showinfo("Info", "No videos selected.")
             return
-        out = Path(self.out_dir_var.get())
+        self._start_downloads(selected, Path(self.out_dir_var.get()), self.format_var.get())
+
+    def _start_downloads(self, ids: list[str], out: Path, audio_format: str):
+        try:
+            rate_limit = parse_rate(self.rate_limit_var.get().strip())
+        except ValueError as e:
+            messagebox.showerror("Error", f"{e}\nUse e.g. 500K or 4.2M (bytes per second).")
+            return
+        normalizer = None
+        if self.settings.get("normalize"):
+            try:
+                normalizer = Normalizer(
+                    LOUDNESS_FILE, self.settings["normalize"],
+                    self.settings.get("target_lufs", DEFAULT_TARGET_LUFS), ffmpeg=FFMPEG_EXE,
+                )
+            except ValueError as e:
+                messagebox.showerror("Error", f"{e}\nSet \"normalize\" to \"tag\" or \"apply\" in settings.json.")
+                return
         out.mkdir(parents=True, exist_ok=True)
         self._lock_ui()
         self.status_lbl.configure(text="Starting downloads...")
-        self.progress.configure(mode="determinate", value=0, maximum=len(selected))
+        self.progress.stop()  # a listing may still be streaming in
+        self.progress.configure(mode="determinate", value=0, maximum=len(ids))
         self.details_lbl.configure(text="")
-        threading.Thread(target=self._download_worker, args=(selected, out), daemon=True).start()
-
-    def _download_worker(self, ids: list[str], out: Path):
-        selected_format = self.format_var.get()
-        for vid in ids:
-            download_audio(vid, out, self.queue, selected_format)
+        self.job_states = {}
+        self.job_progress = {}
+        self.job_paths = {}
+        self.progress_text = ""
+        self.network_text = ""
+        self.journal.add_jobs(ids, out, audio_format)
+        self.scheduler = build_scheduler(
+            out, self.queue, audio_format,
+            workers=self._get_concurrency(),
+            retries=self.settings.get("retries", DEFAULT_RETRIES),
+            pipeline=self.settings.get("pipeline", DEFAULT_PIPELINE),
+            cpu_workers=self.settings.get("cpu_workers"),
+            batch_size=self.settings.get("batch_size", DEFAULT_BATCH_SIZE),
+            on_change=self.journal.update,
+            on_output=self.journal.set_path,
+            metrics=self.metrics,
+            rate_limit=rate_limit,
+            adaptive=self.adaptive_var.get(),
+            library=self.library,
+            thumbnails=self.thumbnails,
+            normalizer=normalizer,
+        )
+        self.cancel_btn.state(["!disabled"])
+        threading.Thread(target=self._download_worker, args=(self.scheduler, ids, out), daemon=True).start()
+
+    def _download_worker(self, scheduler: DownloadScheduler, ids: list[str], out: Path):
+        scheduler.run(ids)
+        self.journal.compact()
         self.queue.put(("finished", str(out)))
 
+    def _offer_resume(self):
+        pending = self.journal.pending()
+        if not pending or self.scheduler is not None:
+            return
+        total = sum(len(ids) for ids in pending.values())
+        folders = "\n".join(f"{out} ({fmt}, {len(ids)})" for (out, fmt), ids in pending.items())
+        if not messagebox.askyesno(
+            "Resume downloads",
+            f"{total} download(s) from the last session did not finish:\n{folders}\n\nResume them now?",
+        ):
+            self.journal.clear()
+            return
+        # Resume the largest group now; the rest stays in the journal and is
+        # offered again on the next start.
+        (out, fmt), ids = max(pending.items(), key=lambda kv: len(kv[1]))
+        self._start_downloads(ids, Path(out), fmt)
+
+    def cancel_downloads(self):
+        if self.scheduler is not None:
+            self.scheduler.cancel()
+            self.cancel_btn.state(["disabled"])
+            self.status_lbl.configure(text="Cancelling...")
+
+    def _get_concurrency(self) -> int:
+        try:
+            return max(1, min(16, int(self.concurrency_var.get())))
+        except (tk.TclError, ValueError):
+            return DEFAULT_CONCURRENCY
+
+    def _update_download_status(self):
+        total = len(self.job_states)
+        done = failed = active = 0
+        for state in self.job_states.values():
+            if state in FINAL_STATES:
+                done += 1
+                failed += state == FAILED
+            elif state != QUEUED:
+                active += 1
+        partial = sum(self.job_progress.get(vid, 0.0) for vid, st in self.job_states.items()
+                      if st not in FINAL_STATES) / 100
+        self.progress.configure(value=done + partial)
+        text = f"Downloading {done}/{total} • {active} active"
+        if failed:
+            text += f" • {failed} failed"
+        paths = list(self.job_paths.values())
+        if paths:
+            text += f" • {paths.count(REMUX)} remuxed, {paths.count(TRANSCODE)} transcoded"
+            if LIBRARY in paths:
+                text += f", {paths.count(LIBRARY)} from library"
+        self.status_lbl.configure(text=text)
+
     # ---------------- QUEUE POLLING ----------------
     def _poll_queue(self):
+        now = time.monotonic()
+        stats = self.poll_stats
+        if self._next_poll_at is not None:
+            lag = max(0.0, now - self._next_poll_at) * 1000
+            stats["lag_ms"] = lag
+            stats["max_lag_ms"] = max(stats["max_lag_ms"], lag)
+
+        batch = []
         try:
-            msg, *payload = self.queue.get_nowait()
-            if msg == "populate":
-                self._populate_list()
-            elif msg == "progress":
-                pct, spd, eta = payload
-                self.progress.configure(value=pct)
-                self.details_lbl.configure(text=f"{pct:.1f}% • {spd} • ETA {eta}")
-            elif msg == "done":
-                vid, ok = payload
-                self.progress.step(1)
-            elif msg == "error":
-                self._unlock_ui()
-                messagebox.showerror("Error", payload[0])
-            elif msg == "finished":
-                out = payload[0]
-                self._unlock_ui()
-                self.status_lbl.configure(text="All done.")
-                self.details_lbl.configure(text="")
-                if self.warnings:
-                    messagebox.showwarning("Warnings", "\n".join(self.warnings))
-                    self.warnings.clear()
-                if messagebox.askyesno("Finished", f"Saved to:\n{out}\nOpen folder?"):
-                    os.startfile(out)
+            while len(batch) < POLL_BATCH:
+                batch.append(self.queue.get_nowait())
         except queue.Empty:
             pass
-        self.after(100, self._poll_queue)
+
+        # Only the newest progress line per video is worth drawing.
+        latest = {}
+        for idx, item in enumerate(batch):
+            if item[0] == "progress":
+                latest[item[1]] = idx
+        for idx, (msg, *payload) in enumerate(batch):
+            if msg == "progress" and latest[payload[0]] != idx:
+                stats["coalesced"] += 1
+                continue
+            self._handle_message(msg, payload)
+        if self._status_dirty:
+            self._status_dirty = False
+            self._update_download_status()
+
+        depth = self.queue.qsize()
+        stats["ticks"] += 1
+        stats["messages"] += len(batch)
+        stats["max_batch"] = max(stats["max_batch"], len(batch))
+        stats["queue_depth"] = depth
+        stats["max_queue_depth"] = max(stats["max_queue_depth"], depth)
+
+        if batch:
+            self._last_message_at = now
+        active = (self.scheduler is not None or depth > 0
+                  or now - self._last_message_at < POLL_IDLE_AFTER)
+        interval = POLL_ACTIVE_MS if active else POLL_IDLE_MS
+        self._next_poll_at = time.monotonic() + interval / 1000
+        self.after(interval, self._poll_queue)
+
+    def _handle_message(self, msg: str, payload: list):
+        if msg == "populate":
+            self._populate_list()
+        elif msg == "progress":
+            vid, pct, spd, eta = payload
+            self.job_progress[vid] = pct
+            self._status_dirty = True
+            self._show_details(f"{pct:.1f}% • {spd} • ETA {eta}")
+        elif msg == "state":
+            vid, state = payload
+            self.job_states[vid] = state
+            if state == QUEUED:
+                self.job_progress.pop(vid, None)
+            self._status_dirty = True
+        elif msg == "network":
+            self.network_text = describe_network(payload[0])
+            self._show_details()
+        elif msg == "path":
+            vid, path = payload
+            self.job_paths[vid] = path
+            self._status_dirty = True
+        elif msg == "done":
+            vid, ok = payload
+            self.job_progress.pop(vid, None)
+        elif msg == "warning":
+            self.warnings.append(payload[0])
+        elif msg == "status":
+            self.status_lbl.configure(text=payload[0])
+        elif msg == "playlist_diff":
+            self._apply_playlist_diff(*payload)
+        elif msg == "refresh_failed":
+            self._refresh_failed(*payload)
+        elif msg == "stream_start":
+            self._start_stream(*payload)
+        elif msg == "entries":
+            self._append_entries(*payload)
+        elif msg == "stream_done":
+            self._finish_stream(*payload)
+        elif msg == "merged":
+            self._apply_merged(*payload)
+        elif msg == "preview":
+            self._show_preview(*payload)
+        elif msg == "error":
+            if self.scheduler is None:
+                self.progress.stop()
+                self._unlock_ui()
+            messagebox.showerror("Error", payload[0])
+        elif msg == "finished":
+            out = payload[0]
+            self._status_dirty = False
+            cancelled = self.scheduler is not None and self.scheduler.cancelled
+            failed = sum(st == FAILED for st in self.job_states.values())
+            self.scheduler = None
+            self._unlock_ui()
+            self.cancel_btn.state(["disabled"])
+            if cancelled:
+                self.status_lbl.configure(text="Cancelled.")
+            elif failed:
+                self.status_lbl.configure(text=f"Done with {failed} failed download(s).")
+            else:
+                self.status_lbl.configure(text="All done.")
+            self.details_lbl.configure(text="")
+            if self.warnings:
+                messagebox.showwarning("Warnings", "\n".join(self.warnings))
+                self.warnings.clear()
+            if messagebox.askyesno("Finished", f"Saved to:\n{out}\nOpen folder?"):
+                os.startfile(out)
+
+    def _show_details(self, progress: str | None = None):
+        if progress is not None:
+            self.progress_text = progress
+        parts = [self.progress_text, self.network_text]
+        self.details_lbl.configure(text="  |  ".join(p for p in parts if p))
+
+    def show_poll_stats(self):
+        st = self.poll_stats
+        messagebox.showinfo("Queue Statistics", "\n".join([
+            f"Queue depth: {st['queue_depth']} (max {st['max_queue_depth']})",
+            f"Tick lag: {st['lag_ms']:.0f} ms (max {st['max_lag_ms']:.0f} ms)",
+            f"Messages: {st['messages']} in {st['ticks']} ticks (max batch {st['max_batch']})",
+            f"Coalesced progress updates: {st['coalesced']}",
+        ]))
 
     # ---------------- POPULATE LIST ----------------
-    def _populate_list(self, entries_to_populate: list[dict] = None):
-        if entries_to_populate is None:
-            entries_to_populate = self.entries
-
-        for w in self.list_frame.winfo_children():
-            w.destroy()
-        self.check_vars = []
-        out = Path(self.out_dir_var.get())
-        existing = set()
-        if out.exists():
-            for f in out.iterdir():
-                if f.suffix == ".m4a":
-                    m = re.search(r"[-_ ]?\[?([A-Za-z0-9_-]{11})\]?\.m4a$", f.name)
-                    if m:
-                        existing.add(m.group(1))
-        for e in entries_to_populate:
-            vid = e.get("id")
-            title = e.get("title","(untitled)")
-            dur = fmt_dur(e.get("duration"))
-            done = vid in existing
-            var = tk.IntVar(value=0 if done else 1)
-
-            item_frame = ttk.Frame(self.list_frame) # NEW FRAME FOR HIGHLIGHT
-            item_frame.pack(anchor="w", fill="x", pady=2)
-
-            text = f"{title} • {dur}" + (" (downloaded)" if done else "")
-            cb = ttk.Checkbutton(item_frame, text=text, variable=var, command=lambda v=var, f=item_frame: self._on_checkbutton_toggle(v, f)) # MODIFIED COMMAND
-
-            # Apply initial highlight color
-            if done:
-                item_frame.configure(style="Downloaded.TFrame")
-                cb.configure(style="Downloaded.TCheckbutton", state="disabled")
-            elif var.get(): # If initially selected
-                item_frame.configure(style="Selected.TFrame")
-                cb.configure(style="Selected.TCheckbutton")
-
-            cb.pack(side="left", fill="x", expand=True) # Pack checkbox inside its frame
-            self._bind_scroll(item_frame) # Bind scroll to the frame
-            self.check_vars.append((var, vid))
+    def _populate_list(self):
+        # Keep the user's choices for videos that were already listed.
+        previous = {e.id: sel for e, sel in zip(self.entries_shown, self.selected)}
+        existing = DownloadArchive.for_directory(Path(self.out_dir_var.get()))
+        existing.reconcile()
+        texts, selected, downloaded = [], [], []
+        for e in self.entries:
+            text, sel, done = self._row_state(e, existing, previous)
+            texts.append(text)
+            selected.append(sel)
+            downloaded.append(done)
+        self.entries_shown = self.entries
+        self.selected, self.downloaded = selected, downloaded
+        self.search_index = SearchIndex(self.entries)
+        self.canvas.set_data(texts, selected, downloaded)
+        if self.search_var.get():
+            self._apply_filter()
         self._update_selected_count()
+        if self.scheduler is not None:
+            # A late background refresh must not unlock the UI or take over
+            # the progress bar and status line while downloads are running.
+            return
         self.progress.stop()
-        self.status_lbl.configure(text=f"Playlist: {len(entries_to_populate)} videos loaded.")
+        self.status_lbl.configure(text=f"Playlist: {len(self.entries)} videos loaded.")
         self._unlock_ui()
 
-    # ---------------- SCROLL BINDING ----------------
-    def _on_mousewheel(self, event):
-        if os.name == 'nt':
-            self.canvas.yview_scroll(int(-1*(event.delta/120)), 'units')
+    def _row_state(self, e: Entry, existing: DownloadArchive, previous: dict) -> tuple[str, bool, bool]:
+        vid = e.id
+        title = e.title or "(untitled)"
+        dur = fmt_dur(e.duration)
+        done = vid in existing
+        text = f"{title} • {dur}"
+        sources = e.sources
+        if sources:
+            shown = ", ".join(sources[:3]) + (f" +{len(sources) - 3}" if len(sources) > 3 else "")
+            text += f" • [{shown}]"
+        text += " (downloaded)" if done else ""
+        return text, not done and previous.get(vid, True), done
+
+    # ---------------- THUMBNAIL PREVIEWS ----------------
+    def _toggle_previews(self):
+        if self.thumbnails is not None and self.preview_var.get():
+            self.preview_lbl.pack(side="right", fill="y", padx=(5, 0), before=self.canvas)
         else:
-            if event.num == 4:
-                self.canvas.yview_scroll(-1, 'units')
-            elif event.num == 5:
-                self.canvas.yview_scroll(1, 'units')
-
-    def _bind_scroll(self, widget):
-        widget.bind("<MouseWheel>", self._on_mousewheel)
-        widget.bind("<Button-4>", self._on_mousewheel)
-        widget.bind("<Button-5>", self._on_mousewheel)
+            self.preview_lbl.pack_forget()
+            self.preview_lbl.configure(image="")
+            self._preview_images.clear()
+            self._preview_vid = None
 
-    # ---------------- HELPERS ----------------
-    def _on_checkbutton_toggle(self, var, item_frame):
-        self._update_selected_count()
-        cb = item_frame.winfo_children()[0]
-        if var.get():
-            item_frame.configure(style="Selected.TFrame")
-            cb.configure(style="Selected.TCheckbutton")
-        else:
-            item_frame.configure(style="TFrame")
-            cb.configure(style="TCheckbutton")
+    def _on_row_hover(self, i: int):
+        if self.thumbnails is None or not self.preview_var.get():
+            return
+        vid = self.entries_shown[i].id
+        if vid is None or vid == self._preview_vid:
+            return
+        self._preview_vid = vid
+        # Only load once the pointer rests on a row, not for every row it crosses.
+        if self._preview_after_id is not None:
+            self.after_cancel(self._preview_after_id)
+        self._preview_after_id = self.after(PREVIEW_DELAY_MS, self._load_preview)
+
+    def _load_preview(self):
+        self._preview_after_id = None
+        vid = self._preview_vid
+        if vid in self._preview_images:
+            self.preview_lbl.configure(image=self._preview_images[vid])
+            return
+        threading.Thread(
+            target=lambda: self.queue.put(("preview", vid, self.thumbnails.preview(vid))),
+            daemon=True,
+        ).start()
 
-    def _update_selected_count(self):
-        self.selected_count.set(sum(v.get() for v, _ in self.check_vars))
+    def _show_preview(self, vid: str, path: Path | None):
+        if path is None or vid != self._preview_vid or not self.preview_var.get():
+            return
+        try:
+            image = tk.PhotoImage(file=str(path))
+        except tk.TclError:
+            return
+        self._preview_images[vid] = image
+        while len(self._preview_images) > PREVIEW_MEMORY:
+            del self._preview_images[next(iter(self._preview_images))]
+        self.preview_lbl.configure(image=image)
 
     # ---------------- SCROLL BINDING ----------------
     def _on_mousewheel(self, event):
@@ -422,22 +965,22 @@ class App(tk.Tk):
         widget.bind("<Button-4>", self._on_mousewheel)
         widget.bind("<Button-5>", self._on_mousewheel)
 
-    def _on_frame_configure(self, event):
-        self.canvas.configure(scrollregion=self.canvas.bbox("all"))
-
     # ---------------- HELPERS ----------------
     def _update_selected_count(self):
-        self.selected_count.set(sum(v.get() for v, _ in self.check_vars))
+        self.selected_count.set(sum(self.selected[i] for i in self.canvas.rows))
 
-    def select_all(self):
-        for v,_ in self.check_vars:
-            v.set(1)
+    def _set_visible_selection(self, value: bool):
+        for i in self.canvas.rows:
+            if not self.downloaded[i]:
+                self.selected[i] = value
+        self.canvas.redraw()
         self._update_selected_count()
 
+    def select_all(self):
+        self._set_visible_selection(True)
+
     def deselect_all(self):
-        for v,_ in self.check_vars:
-            v.set(0)
-        self._update_selected_count()
+        self._set_visible_selection(False)
 
     def open_out_dir(self):
         try:
@@ -453,6 +996,7 @@ class App(tk.Tk):
     def _refresh_downloaded_status(self):
         self.status_lbl.configure(text="Refreshing downloaded status...")
         self.progress.configure(mode="indeterminate"); self.progress.start()
+        DownloadArchive.for_directory(Path(self.out_dir_var.get())).reconcile(force=True)
         self._populate_list()
         self.progress.stop()
         self.status_lbl.configure(text="Ready.")